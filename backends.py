@@ -0,0 +1,265 @@
+import datetime
+import sqlite3
+import threading
+import uuid
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Protocol, Tuple
+
+import pandas as pd
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+# In-memory database: no durability to protect, so skip fsync work and keep temp data in RAM
+SQLITE_PRAGMAS = (
+    "PRAGMA synchronous=OFF",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-65536",
+)
+# Parallel workers (and pooled connections) for fetching per-table sample rows
+SAMPLE_WORKERS = 8
+SAMPLE_ROWS = 3
+# Query results come back as Arrow-backed columns when pyarrow is installed
+READ_SQL_KWARGS = {'dtype_backend': 'pyarrow'} if pyarrow is not None else {}
+# Rows per executemany batch; keeps each multi-row MySQL INSERT well under max_allowed_packet
+INSERT_BATCH_ROWS = 1000
+
+# Column types per dtype kind (i=int, u=unsigned, f=float, b=bool, M=datetime, D=date-only); anything else is TEXT
+SQLITE_TYPES = {'i': 'INTEGER', 'u': 'INTEGER', 'f': 'REAL', 'b': 'INTEGER', 'M': 'TIMESTAMP', 'D': 'DATE'}
+MYSQL_TYPES = {'i': 'BIGINT', 'u': 'BIGINT UNSIGNED', 'f': 'DOUBLE', 'b': 'BOOLEAN', 'M': 'DATETIME', 'D': 'DATE'}
+
+
+def _quote(identifier: str) -> str:
+    return "`" + identifier.replace("`", "``") + "`"
+
+
+def _kind(dtype) -> str:
+    """dtype.kind, except Arrow date32/date64 columns (which also report 'M') are 'D'"""
+    if pyarrow is not None and isinstance(dtype, pd.ArrowDtype) and pyarrow.types.is_date(dtype.pyarrow_dtype):
+        return 'D'
+    return getattr(dtype, 'kind', 'O')
+
+
+def _create_table_sql(df: pd.DataFrame, table_name: str, types: Dict[str, str]) -> str:
+    columns = ", ".join(
+        f"{_quote(str(col))} {types.get(_kind(dtype), 'TEXT')}"
+        for col, dtype in df.dtypes.items()
+    )
+    return f"CREATE TABLE {_quote(table_name)} ({columns})"
+
+
+def _insert_sql(df: pd.DataFrame, table_name: str, placeholder: str) -> str:
+    return f"INSERT INTO {_quote(table_name)} VALUES ({', '.join([placeholder] * len(df.columns))})"
+
+
+def _rows(df: pd.DataFrame) -> List[tuple]:
+    """Plain Python tuples for executemany: NaN/NaT become None, dates and datetimes ISO text"""
+    df = df.copy()
+    for col, dtype in df.dtypes.items():
+        kind = _kind(dtype)
+        if kind == 'M':
+            df[col] = df[col].dt.strftime('%Y-%m-%d %H:%M:%S')
+        elif kind == 'D':
+            df[col] = df[col].dt.strftime('%Y-%m-%d')
+    return list(df.astype(object).where(df.notna(), None).itertuples(index=False, name=None))
+
+
+def prompt_sample(row: Dict) -> Dict:
+    """A sample row for the LLM prompt, with dates and timestamps as ISO text instead of Python reprs"""
+    return {col: str(value) if isinstance(value, datetime.date) else value for col, value in row.items()}
+
+
+class Backend(Protocol):
+    name: str
+
+    def read_sql(self, query: str) -> pd.DataFrame: ...
+    def frame(self, columns: List[str], rows: list) -> pd.DataFrame: ...
+    def fetch(self, query: str) -> Tuple[List[str], list]: ...
+    def execute(self, query: str) -> int: ...
+    def write_table(self, df: pd.DataFrame, table_name: str, replace: bool) -> None: ...
+    def list_tables(self) -> List[str]: ...
+    def table_columns(self) -> Dict[str, List[str]]: ...
+    def fetch_samples(self, table_names: List[str]) -> Dict[str, list]: ...
+
+
+class SqliteBackend:
+    """In-memory SQLite database that every thread of one assistant can read"""
+    name = "in-memory SQLite"
+
+    def __init__(self):
+        # Named shared-cache memory DB so worker threads can open their own connections to it
+        self._db_uri = f"file:drako_{uuid.uuid4().hex}?mode=memory&cache=shared"
+        self._local = threading.local()
+        self.connection = self._connect()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self._db_uri, uri=True, check_same_thread=False)
+        for pragma in SQLITE_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def _reader(self) -> sqlite3.Connection:
+        """Per-thread connection so concurrent analyze calls don't queue on one handle"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    def read_sql(self, query: str) -> pd.DataFrame:
+        return pd.read_sql_query(query, self._reader(), **READ_SQL_KWARGS)
+
+    def frame(self, columns: List[str], rows: list) -> pd.DataFrame:
+        """DataFrame from fetch() output with the same dtypes read_sql would give"""
+        if pyarrow is None or not rows:
+            return pd.DataFrame.from_records(rows, columns=columns, coerce_float=True)
+        arrays = [pyarrow.array(column) for column in zip(*rows)]
+        return pyarrow.Table.from_arrays(arrays, names=columns).to_pandas(types_mapper=pd.ArrowDtype)
+
+    def fetch(self, query: str) -> Tuple[List[str], list]:
+        cursor = self._reader().cursor()
+        try:
+            cursor.execute(query)
+            return [col[0] for col in cursor.description], cursor.fetchall()
+        finally:
+            cursor.close()
+
+    def execute(self, query: str) -> int:
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute(query)
+            self.connection.commit()
+            return cursor.rowcount
+        finally:
+            cursor.close()
+
+    def write_table(self, df: pd.DataFrame, table_name: str, replace: bool) -> None:
+        # One transaction of executemany instead of pandas/SQLAlchemy's per-chunk machinery
+        with self.connection:
+            if replace:
+                self.connection.execute(f"DROP TABLE IF EXISTS {_quote(table_name)}")
+                self.connection.execute(_create_table_sql(df, table_name, SQLITE_TYPES))
+            self.connection.executemany(_insert_sql(df, table_name, "?"), _rows(df))
+
+    def list_tables(self) -> List[str]:
+        rows = self.connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall()
+        return [row[0] for row in rows]
+
+    def table_columns(self) -> Dict[str, List[str]]:
+        return {
+            table_name: [row[1] for row in self.connection.execute(f"PRAGMA table_info(`{table_name}`)")]
+            for table_name in self.list_tables()
+        }
+
+    def fetch_samples(self, table_names: List[str]) -> Dict[str, list]:
+        samples = {}
+        for table_name in table_names:
+            columns, rows = self.fetch(f"SELECT * FROM `{table_name}` LIMIT {SAMPLE_ROWS}")
+            samples[table_name] = [dict(zip(columns, row)) for row in rows]
+        return samples
+
+
+class MySQLBackend:
+    """MySQL database; the driver is only imported when one is configured"""
+    name = "MySQL"
+
+    def __init__(self, mysql_config: Dict):
+        import mysql.connector
+
+        # Prefer the C extension; autocommit so raw-cursor reads never see a stale snapshot
+        self.config = {'use_pure': False, 'autocommit': True, **mysql_config}
+        self.connection = mysql.connector.connect(**self.config)
+        # Only write_table still uses the main connection; the lock keeps uploads from overlapping on it
+        self._connection_lock = threading.Lock()
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        # get_connection() raises instead of waiting when the pool is empty, so callers queue here
+        self._pool_slots = threading.BoundedSemaphore(SAMPLE_WORKERS)
+
+    @contextmanager
+    def _pooled(self):
+        """Check out a connection that is safe to use off the main thread, waiting while all are busy"""
+        with self._pool_slots:
+            with self._pool_lock:
+                if self._pool is None:
+                    from mysql.connector.pooling import MySQLConnectionPool
+                    self._pool = MySQLConnectionPool(pool_size=SAMPLE_WORKERS, **self.config)
+            connection = self._pool.get_connection()
+            try:
+                yield connection
+            finally:
+                connection.close()
+
+    def _fetch_on(self, connection, query: str, dictionary: bool = False):
+        cursor = connection.cursor(dictionary=dictionary)
+        try:
+            cursor.execute(query)
+            columns = [col[0] for col in cursor.description]
+            return columns, cursor.fetchall()
+        finally:
+            cursor.close()
+
+    def read_sql(self, query: str) -> pd.DataFrame:
+        return self.frame(*self.fetch(query))
+
+    def frame(self, columns: List[str], rows: list) -> pd.DataFrame:
+        # Straight from the DB-API cursor; coerce_float turns DECIMAL aggregates into floats like read_sql did
+        return pd.DataFrame.from_records(rows, columns=columns, coerce_float=True)
+
+    def fetch(self, query: str) -> Tuple[List[str], list]:
+        with self._pooled() as connection:
+            return self._fetch_on(connection, query)
+
+    def execute(self, query: str) -> int:
+        # DML arrives from analyze worker threads too, so it runs on a pooled connection
+        with self._pooled() as connection:
+            cursor = connection.cursor()
+            try:
+                cursor.execute(query)
+                return cursor.rowcount
+            finally:
+                cursor.close()
+
+    def write_table(self, df: pd.DataFrame, table_name: str, replace: bool) -> None:
+        with self._connection_lock:
+            cursor = self.connection.cursor()
+            try:
+                if replace:
+                    cursor.execute(f"DROP TABLE IF EXISTS {_quote(table_name)}")
+                    cursor.execute(_create_table_sql(df, table_name, MYSQL_TYPES))
+                # The driver folds each executemany INSERT into one multi-row statement
+                insert = _insert_sql(df, table_name, "%s")
+                rows = _rows(df)
+                for start in range(0, len(rows), INSERT_BATCH_ROWS):
+                    cursor.executemany(insert, rows[start:start + INSERT_BATCH_ROWS])
+            finally:
+                cursor.close()
+
+    def list_tables(self) -> List[str]:
+        return list(self.table_columns())
+
+    def table_columns(self) -> Dict[str, List[str]]:
+        # One round-trip for every table's columns instead of DESCRIBE per table;
+        # pooled, since refresh_table_data runs it from worker threads after DML
+        _, rows = self.fetch(
+            "SELECT table_name, column_name FROM information_schema.columns "
+            "WHERE table_schema = DATABASE() ORDER BY table_name, ordinal_position"
+        )
+        columns_by_table = {}
+        for table_name, column_name in rows:
+            columns_by_table.setdefault(table_name, []).append(column_name)
+        return columns_by_table
+
+    def _fetch_sample(self, table_name: str) -> list:
+        with self._pooled() as connection:
+            # Dictionary cursor hands back rows already keyed by column name
+            return self._fetch_on(connection, f"SELECT * FROM `{table_name}` LIMIT {SAMPLE_ROWS}", dictionary=True)[1]
+
+    def fetch_samples(self, table_names: List[str]) -> Dict[str, list]:
+        if len(table_names) == 1:
+            return {table_names[0]: self._fetch_sample(table_names[0])}
+        # Independent round-trips, so overlap them on pooled connections
+        with ThreadPoolExecutor(max_workers=min(SAMPLE_WORKERS, len(table_names) or 1)) as executor:
+            return dict(zip(table_names, executor.map(self._fetch_sample, table_names)))
@@ -0,0 +1,61 @@
+import pandas as pd
+from typing import BinaryIO, Iterator, Union
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:
+    pa = None
+    pa_csv = None
+
+# Rows per chunk handed to to_sql; keeps peak memory bounded for large files
+CHUNK_ROWS = 50_000
+
+
+def _read_csv_arrow(file_path: Union[str, BinaryIO], chunk_rows: int) -> Iterator[pd.DataFrame]:
+    # Empty text cells load as NULL, as pd.read_csv would
+    reader = pa_csv.open_csv(file_path, convert_options=pa_csv.ConvertOptions(strings_can_be_null=True))
+    rows_done = 0
+    try:
+        for batch in reader:
+            for start in range(0, batch.num_rows, chunk_rows):
+                # ArrowDtype columns wrap the batch's buffers instead of boxing strings into objects
+                chunk = batch.slice(start, chunk_rows).to_pandas(types_mapper=pd.ArrowDtype)
+                rows_done += len(chunk)
+                yield chunk
+    except pa.ArrowInvalid:
+        # A later block didn't match the types inferred from the first one;
+        # let pandas pick up from the first row that wasn't yielded yet
+        if hasattr(file_path, 'seek'):
+            file_path.seek(0)
+        yield from pd.read_csv(file_path, chunksize=chunk_rows, skiprows=range(1, rows_done + 1),
+                               dtype_backend='pyarrow')
+        return
+
+    if rows_done == 0:
+        yield reader.schema.empty_table().to_pandas(types_mapper=pd.ArrowDtype)
+
+
+def read_excel(file_path: str) -> pd.DataFrame:
+    """Read a workbook with the Rust calamine engine, falling back to openpyxl"""
+    # Arrow-backed columns keep strings out of Python object arrays
+    kwargs = {'dtype_backend': 'pyarrow'} if pa is not None else {}
+    try:
+        return pd.read_excel(file_path, engine='calamine', **kwargs)
+    except (ImportError, ValueError):
+        # python-calamine not installed (or pandas too old to know the engine)
+        return pd.read_excel(file_path, engine='openpyxl', **kwargs)
+
+
+def read_in_chunks(file_path: Union[str, BinaryIO], chunk_rows: int = CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """Yield a CSV/Excel file as DataFrames of at most chunk_rows rows (always at least one)
+
+    A CSV may also be an open binary file (anything with a .name), read without a copy on disk.
+    """
+    if getattr(file_path, 'name', file_path).endswith('.csv'):
+        if pa_csv is not None:
+            yield from _read_csv_arrow(file_path, chunk_rows)
+        else:
+            yield from pd.read_csv(file_path, chunksize=chunk_rows)
+    else:
+        yield read_excel(file_path)
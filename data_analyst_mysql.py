@@ -1,38 +1,60 @@
 import pandas as pd
-import mysql.connector
-import requests
-from typing import Dict, Any
+from backends import Backend, SqliteBackend, MySQLBackend, prompt_sample
+from ollama_client import OllamaClient
+from chunked_reader import read_in_chunks
+from fast_agg import quick_insight
+from typing import BinaryIO, Dict, Any, Iterator, List, Tuple, Union
 import os
 import json
 import re
-from sqlalchemy import create_engine
-from urllib.parse import quote_plus
+import asyncio
+import threading
+from functools import partial
+from sql_quoting import build_automaton, has_limit, quote_with_automaton
+
+# Compiled once per process; [^;]* stops at the first ';' without backtracking
+_MARKDOWN_RE = re.compile(r'```sql\n?|```\n?|SQL:|Query:', re.IGNORECASE)
+_SQL_STATEMENT_RE = re.compile(r'\b(?:SELECT|INSERT|UPDATE|DELETE)\b[^;]*', re.IGNORECASE)
+_SELECT_RE = re.compile(r'^\s*SELECT\b', re.IGNORECASE)
+# Queries whose result is small by construction: a leading COUNT( or a trailing LIMIT under 1000
+_SMALL_RESULT_RE = re.compile(r'^\s*SELECT\s+COUNT\(|\bLIMIT\s+\d{1,3}\s*;?\s*$', re.IGNORECASE)
+
+# LIMIT added to generated SELECTs that don't bound their own result
+MAX_RESULT_ROWS = 10_000
 
 class DataAnalystAssistant:
-    def __init__(self, ollama_url: str = "http://localhost:11434", mysql_config: Dict = None):
+    _ENGLISH_WORDS = frozenset([
+        'what', 'show', 'get', 'find', 'list', 'count', 'sum', 'average', 'top', 'highest', 'lowest',
+        'how', 'which', 'where', 'when', 'why', 'the', 'and', 'or', 'of', 'in', 'to', 'for'
+    ])
+    _WORD_RE = re.compile(r"[a-z]+")
+    
+    def __init__(self, ollama_url: str = "http://localhost:11434", mysql_config: Dict = None,
+                 max_rows: int = MAX_RESULT_ROWS):
         self.ollama_url = ollama_url
+        self.max_rows = max_rows
+        self.ollama = OllamaClient(ollama_url)
         self.mysql_config = mysql_config
-        self.db_connection = None
-        self.engine = None
+        # Files go to in-memory SQLite until connect_mysql swaps in a MySQL backend
+        self.backend: Backend = SqliteBackend()
         self.tables = {}
+        # Guards self.tables and the schema caches; analyze_async workers refresh them after DML
+        self._tables_lock = threading.RLock()
+        # Bumped on every invalidation, so a context built from older tables isn't cached
+        self._schema_version = 0
+        self._schema_cache = None
+        self._sql_prompt_prefix = None
+        self._table_names = []
+        self._quote_re = None
+        self._quote_ac = None
+        self._quote_names = {}
         
         if mysql_config:
             self.connect_mysql()
     
     def connect_mysql(self):
         try:
-            self.db_connection = mysql.connector.connect(**self.mysql_config)
-            
-            # Create SQLAlchemy engine for pandas
-            user = quote_plus(str(self.mysql_config['user']))
-            password = quote_plus(str(self.mysql_config['password']))
-            host = self.mysql_config['host']
-            port = self.mysql_config.get('port', 3306)
-            database = self.mysql_config['database']
-            
-            connection_string = f"mysql+mysqlconnector://{user}:{password}@{host}:{port}/{database}"
-            self.engine = create_engine(connection_string)
-            
+            self.backend = MySQLBackend(self.mysql_config)
             self.load_existing_tables()
             return "Connected to MySQL successfully!"
         except Exception as e:
@@ -40,92 +62,157 @@ class DataAnalystAssistant:
     
     def load_existing_tables(self):
         try:
-            cursor = self.db_connection.cursor()
-            cursor.execute("SHOW TABLES")
-            tables = cursor.fetchall()
-            
-            for (table_name,) in tables:
-                cursor.execute(f"DESCRIBE `{table_name}`")
-                columns_info = cursor.fetchall()
-                columns = [col[0] for col in columns_info]
-                
-                cursor.execute(f"SELECT * FROM `{table_name}` LIMIT 3")
-                sample_rows = cursor.fetchall()
-                sample_data = [dict(zip(columns, row)) for row in sample_rows]
-                
-                self.tables[table_name] = {
-                    'columns': columns,
-                    'sample_data': sample_data
-                }
-            
-            cursor.close()
+            table_columns = self.backend.table_columns()
+            with self._tables_lock:
+                for table_name, columns in table_columns.items():
+                    # Sample rows are fetched on first use by get_sample_data
+                    self.tables[table_name] = {
+                        'columns': columns,
+                        'columns_str': ', '.join(columns),
+                        'sample_data': None,
+                        'sample_df': None
+                    }
         except Exception as e:
             print(f"Error loading existing tables: {e}")
+        finally:
+            self._invalidate_schema_cache()
+    
+    def _invalidate_schema_cache(self):
+        """Drop schema-derived caches after self.tables changes"""
+        with self._tables_lock:
+            self._schema_version += 1
+            self._schema_cache = None
+            self._sql_prompt_prefix = None
+            self._table_names = list(self.tables)
+            self._build_quote_pattern()
+    
+    def _build_quote_pattern(self):
+        """Compile one alternation matching every column that needs backticks"""
+        needs_quotes = {
+            col for info in self.tables.values() for col in info['columns']
+            if ' ' in col or any(char in col for char in ['-', '.', '(', ')'])
+        }
+        # Longest first so "Invoice Number Total" wins over "Invoice Number"
+        ordered = sorted(needs_quotes, key=len, reverse=True)
+        self._quote_names = {col.lower(): col for col in ordered}
+        if ordered:
+            alternation = '|'.join(re.escape(col) for col in ordered)
+            self._quote_re = re.compile(rf'(?<![\w`])({alternation})(?![\w`])', re.IGNORECASE)
+        else:
+            self._quote_re = None
+        
+        self._quote_ac = build_automaton(self._quote_names)
     
     def refresh_table_data(self):
         """Refresh table metadata after DML operations"""
-        if self.db_connection:
-            self.load_existing_tables()
-        elif hasattr(self, 'sqlite_conn'):
-            # Refresh SQLite table data
-            for table_name in list(self.tables.keys()):
-                try:
-                    df = pd.read_sql_query(f"SELECT * FROM `{table_name}` LIMIT 3", self.sqlite_conn)
-                    self.tables[table_name]['sample_data'] = df.to_dict('records')
-                except:
-                    pass
-    
-    def load_file(self, file_path: str, table_name: str = None) -> str:
+        # Columns are re-read in one query; samples go stale and are refetched on demand
+        self.load_existing_tables()
+    
+    def load_file(self, file_path: Union[str, BinaryIO], table_name: str = None) -> str:
         if not table_name:
-            table_name = os.path.splitext(os.path.basename(file_path))[0].lower()
+            table_name = os.path.splitext(os.path.basename(getattr(file_path, 'name', file_path)))[0].lower()
         
-        if file_path.endswith('.csv'):
-            df = pd.read_csv(file_path)
-        else:
-            df = pd.read_excel(file_path)
-        
-        # If MySQL connected, use it; otherwise use in-memory SQLite
-        if self.engine:
-            df.to_sql(table_name, self.engine, if_exists='replace', index=False)
-            storage = "MySQL"
-        else:
-            import sqlite3
-            if not hasattr(self, 'sqlite_conn'):
-                self.sqlite_conn = sqlite3.connect(':memory:', check_same_thread=False)
-            df.to_sql(table_name, self.sqlite_conn, if_exists='replace', index=False)
-            storage = "in-memory SQLite"
+        # Stream the file in chunks so large files never sit in memory whole
+        row_count = 0
+        for i, chunk in enumerate(read_in_chunks(file_path)):
+            self.backend.write_table(chunk, table_name, replace=i == 0)
+            if i == 0:
+                columns = list(chunk.columns)
+                sample_data = chunk.head(3).to_dict('records')
+            row_count += len(chunk)
         
-        self.tables[table_name] = {
-            'columns': list(df.columns),
-            'sample_data': df.head(3).to_dict('records')
-        }
+        with self._tables_lock:
+            self.tables[table_name] = {
+                'columns': columns,
+                'columns_str': ', '.join(columns),
+                'sample_data': sample_data,
+                'sample_df': None
+            }
+        self._invalidate_schema_cache()
         
-        return f"Loaded {len(df)} rows into {storage} table '{table_name}'"
+        return f"Loaded {row_count} rows into {self.backend.name} table '{table_name}'"
     
     def get_available_tables(self) -> list:
         return list(self.tables.keys())
     
+    def get_sample_data(self, table_name: str) -> list:
+        """Return a table's sample rows, fetching them from the database on first use"""
+        info = self.tables[table_name]
+        if info['sample_data'] is None:
+            info['sample_data'] = self.backend.fetch_samples([table_name])[table_name]
+        return info['sample_data']
+    
+    def get_sample_frame(self, table_name: str) -> pd.DataFrame:
+        """get_sample_data as a DataFrame, built once per table instead of on every display"""
+        info = self.tables[table_name]
+        if info['sample_df'] is None:
+            info['sample_df'] = pd.DataFrame.from_records(self.get_sample_data(table_name), columns=info['columns'])
+        return info['sample_df']
+    
+    def prefetch_sample_data(self):
+        """Fetch every missing sample in one backend call (concurrently on MySQL)"""
+        with self._tables_lock:
+            missing = [name for name, info in self.tables.items() if info['sample_data'] is None]
+        if len(missing) < 2:
+            return
+        for table_name, sample in self.backend.fetch_samples(missing).items():
+            self.tables[table_name]['sample_data'] = sample
+    
     def get_schema_context(self) -> str:
-        context = "DATABASE SCHEMA:\n"
-        for table_name, info in self.tables.items():
-            context += f"\nTABLE: {table_name}\n"
-            context += f"COLUMNS: {', '.join(info['columns'])}\n"
-            context += f"SAMPLE: {info['sample_data'][0] if info['sample_data'] else 'No data'}\n"
+        with self._tables_lock:
+            if self._schema_cache is not None:
+                return self._schema_cache
+            version = self._schema_version
+        
+        self.prefetch_sample_data()
+        with self._tables_lock:
+            # Snapshot, so a concurrent refresh can't resize the dict mid-iteration
+            tables = list(self.tables.items())
+        parts = ["DATABASE SCHEMA:\n"]
+        for table_name, info in tables:
+            sample_data = self.get_sample_data(table_name)
+            parts.append(
+                f"\nTABLE: {table_name}\n"
+                f"COLUMNS: {info['columns_str']}\n"
+                f"SAMPLE: {prompt_sample(sample_data[0]) if sample_data else 'No data'}\n"
+            )
+        context = "".join(parts)
+        with self._tables_lock:
+            if self._schema_version == version:
+                self._schema_cache = context
         return context
     
+    def get_sql_prompt_prefix(self) -> str:
+        """Schema and rules shared by every SQL prompt, byte-identical until the schema changes"""
+        with self._tables_lock:
+            if self._sql_prompt_prefix is not None:
+                return self._sql_prompt_prefix
+            version = self._schema_version
+        prefix = f"""{self.get_schema_context()}
+
+Generate ONLY a SQL query for the request below.
+
+IMPORTANT:
+- Return ONLY the SQL query
+- No explanations or text
+- Support SELECT, INSERT, UPDATE, DELETE operations
+- Use exact table/column names from schema
+- Put column names with spaces in backticks like `Invoice Number`
+- For sorting use ORDER BY
+"""
+        with self._tables_lock:
+            if self._schema_version == version:
+                self._sql_prompt_prefix = prefix
+        return prefix
+    
     def quote_column_names(self, sql: str) -> str:
-        all_columns = []
-        for table_info in self.tables.values():
-            all_columns.extend(table_info['columns'])
-        
-        all_columns = sorted(set(all_columns), key=len, reverse=True)
-        
-        for col in all_columns:
-            if ' ' in col or any(char in col for char in ['-', '.', '(', ')']):
-                if f'`{col}`' not in sql:
-                    sql = re.sub(rf'\b{re.escape(col)}\b(?!`)', f'`{col}`', sql, flags=re.IGNORECASE)
-        
-        return sql
+        if self._quote_re is None:
+            return sql
+        if self._quote_ac is not None:
+            quoted = quote_with_automaton(sql, self._quote_ac)
+            if quoted is not None:
+                return quoted
+        return self._quote_re.sub(lambda m: f'`{self._quote_names[m.group(1).lower()]}`', sql)
     
     def detect_sql_operation(self, question: str) -> str:
         question_lower = question.lower()
@@ -154,15 +241,14 @@ class DataAnalystAssistant:
             return f"SELECT * FROM `{table_name}` LIMIT 5"
     
     def clean_sql(self, sql: str) -> str:
-        sql = re.sub(r'```sql\n?|```\n?|SQL:|Query:', '', sql, flags=re.IGNORECASE)
+        sql = _MARKDOWN_RE.sub('', sql)
         sql = sql.strip()
         
-        sql_pattern = r'(SELECT.*?(?:;|$)|INSERT.*?(?:;|$)|UPDATE.*?(?:;|$)|DELETE.*?(?:;|$))'
-        match = re.search(sql_pattern, sql, re.IGNORECASE | re.DOTALL)
+        match = _SQL_STATEMENT_RE.search(sql)
         
         if match:
-            cleaned = match.group(1).strip().rstrip(';')
-            return self.quote_column_names(cleaned)
+            cleaned = match.group(0).strip()
+            return self._bound_rows(self.quote_column_names(cleaned))
         
         lines = []
         for line in sql.split('\n'):
@@ -174,19 +260,24 @@ class DataAnalystAssistant:
                     lines.append(line)
         
         cleaned = ' '.join(lines).strip()
-        return self.quote_column_names(cleaned)
+        return self._bound_rows(self.quote_column_names(cleaned))
+    
+    def _bound_rows(self, sql: str) -> str:
+        """Cap an unbounded SELECT at max_rows so the database, not pandas, drops the excess"""
+        if _SELECT_RE.match(sql) and not has_limit(sql):
+            sql = f"{sql.rstrip().rstrip(';').rstrip()} LIMIT {self.max_rows}"
+        return sql
     
     def detect_language(self, text: str) -> str:
-        # Enhanced language detection
-        english_words = ['what', 'show', 'get', 'find', 'list', 'count', 'sum', 'average', 'top', 'highest', 'lowest', 'how', 'which', 'where', 'when', 'why', 'the', 'and', 'or', 'of', 'in', 'to', 'for']
-        english_count = sum(1 for word in english_words if word in text.lower())
+        # Enhanced language detection: count distinct English keywords among the words
+        english_count = len(self._ENGLISH_WORDS.intersection(self._WORD_RE.findall(text.lower())))
         
         # If more than 2 English words found, consider it English
         if english_count >= 2:
             return 'english'
         
         # Check for non-Latin characters (indicates non-English)
-        has_non_latin = any(ord(char) > 127 for char in text)
+        has_non_latin = not text.isascii()
         if has_non_latin:
             return 'other'
         
@@ -195,7 +286,8 @@ class DataAnalystAssistant:
     
     def translate_to_english(self, text: str) -> tuple:
         try:
-            if self.detect_language(text) == 'english':
+            # Plain-ASCII text is always treated as English, so skip keyword matching too
+            if text.isascii() or self.detect_language(text) == 'english':
                 return text, 'english'
             
             # Enhanced translation to English with better context
@@ -205,20 +297,15 @@ Text: {text}
 
 Provide only the English translation:"""
             
-            response = requests.post(f"{self.ollama_url}/api/generate", json={
-                "model": "llama3",
-                "prompt": translate_prompt,
-                "stream": False,
-                "options": {"temperature": 0.1, "num_predict": 100}
-            })
+            # The translation is a single line; stop at its end
+            response = self.ollama.generate("llama3", translate_prompt, {"temperature": 0.1, "num_predict": 100}, stop=["\n"])
             
-            if response.status_code == 200:
-                result = response.json()
-                if result and "response" in result and result["response"]:
-                    translated = result["response"].strip()
-                    # Clean up common prefixes
-                    if translated.lower().startswith(('english translation:', 'translation:', 'english:')):
-                        translated = translated.split(':', 1)[1].strip()
+            if response:
+                translated = response.strip()
+                # Clean up common prefixes
+                if translated.lower().startswith(('english translation:', 'translation:', 'english:')):
+                    translated = translated.split(':', 1)[1].strip()
+                if translated:
                     return translated, 'other'
         except Exception:
             pass
@@ -230,30 +317,21 @@ Provide only the English translation:"""
             # Much simpler and direct prompt
             translate_prompt = f"Translate '{english_text}' to the same language as '{original_text}'"
             
-            response = requests.post(f"{self.ollama_url}/api/generate", json={
-                "model": "llama3",
-                "prompt": translate_prompt,
-                "stream": False,
-                "options": {"temperature": 0.2, "num_predict": 100}
-            })
+            response = self.ollama.generate("llama3", translate_prompt, {"temperature": 0.2, "num_predict": 100})
             
-            if response.status_code == 200:
-                result = response.json()
-                if result and "response" in result and result["response"]:
-                    translated = result["response"].strip()
-                    # Don't return if it's the same as original question
-                    if translated != original_text and len(translated) > 10:
-                        return translated
+            if response:
+                translated = response.strip()
+                # Don't return if it's the same as original question
+                if translated != original_text and len(translated) > 10:
+                    return translated
                     
         except Exception as e:
             pass
         return english_text
     
-    def nl_to_sql(self, question: str) -> str:
-        english_question, _ = self.translate_to_english(question)
-        
-        schema = self.get_schema_context()
-        table_names = list(self.tables.keys())
+    def nl_to_sql(self, english_question: str) -> str:
+        """Generate SQL for a question that analyze has already translated to English"""
+        table_names = self._table_names
         
         if not table_names:
             raise Exception("No tables loaded. Please upload a file first.")
@@ -261,32 +339,18 @@ Provide only the English translation:"""
         # Detect operation type
         operation_type = self.detect_sql_operation(english_question)
         
-        prompt = f"""{schema}
-
-Generate ONLY a SQL query for this request: {english_question}
-
-IMPORTANT:
-- Return ONLY the SQL query
-- No explanations or text
-- Support SELECT, INSERT, UPDATE, DELETE operations
-- Use exact table/column names from schema
-- Put column names with spaces in backticks like `Invoice Number`
-- For sorting use ORDER BY
+        # Only the tail varies, so Ollama re-prefills just the request tokens
+        prompt = self.get_sql_prompt_prefix() + f"""
+REQUEST: {english_question}
 
 SQL:"""
         
         try:
-            response = requests.post(f"{self.ollama_url}/api/generate", json={
-                "model": "llama3",
-                "prompt": prompt,
-                "stream": False,
-                "options": {"temperature": 0, "num_predict": 80}
-            })
+            # One statement is all we want; stop at its terminator
+            response = self.ollama.generate("llama3", prompt, {"temperature": 0, "num_predict": 80}, stop=[";"])
             
-            if response.status_code == 200:
-                result = response.json()
-                if result and "response" in result and result["response"]:
-                    return self.clean_sql(result["response"])
+            if response:
+                return self.clean_sql(response)
         except Exception:
             pass
         
@@ -302,32 +366,21 @@ SQL:"""
                 return self.execute_dml_query(sql_query)
             else:
                 # Regular SELECT query
-                if self.engine:
-                    return pd.read_sql_query(sql_query, self.engine)
-                elif hasattr(self, 'sqlite_conn'):
-                    return pd.read_sql_query(sql_query, self.sqlite_conn)
-                else:
-                    raise Exception("No database connection available")
+                if _SMALL_RESULT_RE.search(sql_query):
+                    # Same dtypes as the read_sql path, whichever one a query takes
+                    return self.backend.frame(*self.execute_query_small(sql_query))
+                return self.backend.read_sql(sql_query)
         except Exception as e:
             raise Exception(f"Query failed: {str(e)}")
     
+    def execute_query_small(self, sql_query: str) -> tuple:
+        """Run a small-result query on a raw cursor, skipping pandas' SQL layer"""
+        return self.backend.fetch(sql_query)
+    
     def execute_dml_query(self, sql_query: str) -> pd.DataFrame:
         """Execute DML operations and return result summary"""
         try:
-            if self.engine:
-                from sqlalchemy import text
-                with self.engine.connect() as conn:
-                    result = conn.execute(text(sql_query))
-                    conn.commit()
-                    affected_rows = result.rowcount
-            elif hasattr(self, 'sqlite_conn'):
-                cursor = self.sqlite_conn.cursor()
-                cursor.execute(sql_query)
-                self.sqlite_conn.commit()
-                affected_rows = cursor.rowcount
-                cursor.close()
-            else:
-                raise Exception("No database connection available")
+            affected_rows = self.backend.execute(sql_query)
             
             # Reload table data after DML operation
             self.refresh_table_data()
@@ -350,91 +403,116 @@ SQL:"""
             }
             return pd.DataFrame(error_data)
     
+    def _insights_prompt(self, question: str, results: pd.DataFrame) -> str:
+        # Create a clean summary without mentioning count
+        sample_data = results.head(3).to_dict('records')
+        
+        return f"Question: {question}\nData: {sample_data}\n\nAnswer the question directly based on the data. Don't mention how many results were found, just provide the insights."
+    
+    def _drop_count_sentence(self, insight: str) -> str:
+        # Remove common phrases about result counts
+        phrases_to_remove = [
+            "I found", "I only found", "There is only", "There are only", 
+            "The query returned", "Based on the results", "From the data"
+        ]
+        for phrase in phrases_to_remove:
+            if insight.lower().startswith(phrase.lower()):
+                # Find the first sentence and remove the count reference
+                sentences = insight.split('.')
+                if len(sentences) > 1:
+                    insight = '. '.join(sentences[1:]).strip()
+                break
+        return insight
+    
     def generate_insights(self, question: str, query: str, results: pd.DataFrame) -> str:
         if len(results) == 0:
             return "No results found for your query."
         
-        # Create a clean summary without mentioning count
-        sample_data = results.head(3).to_dict('records')
-        
-        prompt = f"Question: {question}\nData: {sample_data}\n\nAnswer the question directly based on the data. Don't mention how many results were found, just provide the insights."
+        prompt = self._insights_prompt(question, results)
         
         try:
-            response = requests.post(f"{self.ollama_url}/api/generate", json={
-                "model": "llama3",
-                "prompt": prompt,
-                "stream": False,
-                "options": {"temperature": 0.2, "num_predict": 80}
-            })
+            response = self.ollama.generate("llama3", prompt, {"temperature": 0.2, "num_predict": 80})
             
-            if response.status_code == 200:
-                result = response.json()
-                if result and "response" in result and result["response"]:
-                    insight = result["response"].strip()
-                    # Remove common phrases about result counts
-                    phrases_to_remove = [
-                        "I found", "I only found", "There is only", "There are only", 
-                        "The query returned", "Based on the results", "From the data"
-                    ]
-                    for phrase in phrases_to_remove:
-                        if insight.lower().startswith(phrase.lower()):
-                            # Find the first sentence and remove the count reference
-                            sentences = insight.split('.')
-                            if len(sentences) > 1:
-                                insight = '. '.join(sentences[1:]).strip()
-                            break
-                    return insight
+            if response:
+                return self._drop_count_sentence(response.strip())
         except Exception:
             pass
         
         return "Here are the results for your query."
     
+    def stream_insights(self, question: str, query: str, results: pd.DataFrame) -> Iterator[str]:
+        """generate_insights as a stream of text chunks, so the answer can be shown while it's written"""
+        if len(results) == 0:
+            yield "No results found for your query."
+            return
+        
+        prompt = self._insights_prompt(question, results)
+        # Hold text back until the first sentence is complete, since that's the one that may be dropped
+        head, head_done, yielded = "", False, False
+        try:
+            for chunk in self.ollama.generate_stream("llama3", prompt, {"temperature": 0.2, "num_predict": 80}):
+                if head_done:
+                    yielded = True
+                    yield chunk
+                    continue
+                head += chunk
+                if '.' in head:
+                    head_done = True
+                    head = self._drop_count_sentence(head.lstrip())
+                    if head:
+                        yielded = True
+                        yield head
+            if not head_done and head.strip():
+                yielded = True
+                yield self._drop_count_sentence(head.strip())
+        except Exception:
+            pass
+        
+        if not yielded:
+            yield "Here are the results for your query."
+    
+    def _run_question(self, question: str, table_context: str = None) -> tuple:
+        """Translate, generate SQL and run it: everything analyze does before writing insights"""
+        english_question, original_language = self.translate_to_english(question)
+        
+        # Add table context to question if provided
+        if table_context:
+            context_question = f"From the {table_context} table: {english_question}"
+        else:
+            context_question = english_question
+        
+        sql_query = self.nl_to_sql(context_question)
+        results = self.execute_query(sql_query)
+        return english_question, original_language, context_question, sql_query, results
+    
+    def _result(self, question: str, english_question: str, original_language: str,
+                sql_query: str, results: pd.DataFrame, insights: str) -> Dict[str, Any]:
+        return {
+            'question': question,
+            'english_question': english_question if original_language == 'other' else None,
+            'was_translated': original_language == 'other',
+            'sql_query': sql_query,
+            # Columnar: one list per column instead of a dict per row; {} when empty
+            'results': results.to_dict('list') if not results.empty else {},
+            'insights': insights,
+            'success': True
+        }
+    
     def analyze(self, question: str, table_context: str = None) -> Dict[str, Any]:
         try:
-            english_question, original_language = self.translate_to_english(question)
-            
-            # Add table context to question if provided
-            if table_context:
-                context_question = f"From the {table_context} table: {english_question}"
-            else:
-                context_question = english_question
-            
-            sql_query = self.nl_to_sql(context_question)
-            results = self.execute_query(sql_query)
-            english_insights = self.generate_insights(context_question, sql_query, results)
+            english_question, original_language, context_question, sql_query, results = \
+                self._run_question(question, table_context)
+            # Simple count/top-N/total answers are computed locally, skipping an LLM round-trip
+            english_insights = quick_insight(english_question, results, sql_query) or self.generate_insights(context_question, sql_query, results)
             
             # Always translate insights back if it was a non-English question
             if original_language == 'other':
+                # translate_from_english falls back to the English text if translation fails
                 insights = self.translate_from_english(english_insights, question)
-                
-                # If translation failed, try simpler approach
-                if insights == english_insights or self.detect_language(insights) == 'english':
-                    simple_prompt = f"Convert this English text to the same language as '{question}': {english_insights}"
-                    try:
-                        response = requests.post(f"{self.ollama_url}/api/generate", json={
-                            "model": "llama3",
-                            "prompt": simple_prompt,
-                            "stream": False,
-                            "options": {"temperature": 0.2, "num_predict": 200}
-                        })
-                        if response.status_code == 200:
-                            result = response.json()
-                            if result and "response" in result:
-                                insights = result["response"].strip()
-                    except Exception:
-                        pass
             else:
                 insights = english_insights
             
-            return {
-                'question': question,
-                'english_question': english_question if original_language == 'other' else None,
-                'was_translated': original_language == 'other',
-                'sql_query': sql_query,
-                'results': results.to_dict('records'),
-                'insights': insights,
-                'success': True
-            }
+            return self._result(question, english_question, original_language, sql_query, results, insights)
             
         except Exception as e:
             return {
@@ -443,5 +521,46 @@ SQL:"""
                 'success': False
             }
     
+    def analyze_stream(self, question: str, table_context: str = None) -> Tuple[Dict[str, Any], Iterator[str]]:
+        """Like analyze, but the insights come as an iterator of text chunks.
+
+        The SQL runs before this returns; the result's 'insights' is filled in
+        once the iterator has been read to the end.
+        """
+        try:
+            english_question, original_language, context_question, sql_query, results = \
+                self._run_question(question, table_context)
+        except Exception as e:
+            return {'question': question, 'error': str(e), 'success': False}, iter(())
+        
+        result = self._result(question, english_question, original_language, sql_query, results, None)
+        
+        def insight_chunks():
+            quick = quick_insight(english_question, results, sql_query)
+            if quick or original_language == 'other':
+                # Translation needs the whole English answer first, so there is nothing to stream
+                insights = quick or self.generate_insights(context_question, sql_query, results)
+                if original_language == 'other':
+                    insights = self.translate_from_english(insights, question)
+                yield insights
+            else:
+                parts = []
+                for chunk in self.stream_insights(context_question, sql_query, results):
+                    parts.append(chunk)
+                    yield chunk
+                insights = "".join(parts).strip()
+            result['insights'] = insights
+        
+        return result, insight_chunks()
+
+    async def analyze_async(self, questions: List[str], table_context: str = None) -> List[Dict[str, Any]]:
+        """Analyze several questions concurrently so their Ollama round-trips overlap"""
+        loop = asyncio.get_running_loop()
+        tasks = [
+            loop.run_in_executor(None, partial(self.analyze, question, table_context))
+            for question in questions
+        ]
+        return await asyncio.gather(*tasks)
+
     def load_excel(self, file_path: str, table_name: str = None) -> str:
         return self.load_file(file_path, table_name)
\ No newline at end of file
@@ -1,80 +1,205 @@
 import pandas as pd
 import sqlite3
-import requests
-from typing import Dict, Any
+import csv
+from itertools import islice
+from ollama_client import OllamaClient, analyze_many
+from chunked_reader import read_excel
+from backends import READ_SQL_KWARGS, prompt_sample
+from sql_quoting import backticks_to_double_quotes, build_automaton, quote_with_automaton
+from typing import Dict, Any, List
 import os
 import json
 import re
+import threading
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+# Compiled once per process; [^;]* stops at the first ';' without backtracking
+_MARKDOWN_RE = re.compile(r'```sql\n?|```\n?|SQL:|Query:', re.IGNORECASE)
+_SQL_STATEMENT_RE = re.compile(r'\b(?:SELECT|INSERT|UPDATE|DELETE)\b[^;]*', re.IGNORECASE)
+# Longest LLM response scanned for a statement; bounds the worst case on runaway output
+MAX_SQL_RESPONSE = 8192
+# Rows per executemany call when streaming a CSV into SQLite
+CSV_BATCH_ROWS = 10_000
+
+def _quote_identifier(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
 
 class DataAnalystAssistant:
-    def __init__(self, ollama_url: str = "http://localhost:11434"):
+    def __init__(self, ollama_url: str = "http://localhost:11434", use_duckdb: bool = False):
         self.ollama_url = ollama_url
-        self.db_connection = sqlite3.connect(':memory:', check_same_thread=False)
+        # Keep-alive session shared by every Ollama call
+        self.ollama = OllamaClient(ollama_url)
+        # DuckDB ingests and scans columnar; opt-in, and only if the package is installed
+        self.use_duckdb = use_duckdb and duckdb is not None
+        if self.use_duckdb:
+            self.db_connection = duckdb.connect()
+        else:
+            self.db_connection = sqlite3.connect(':memory:', check_same_thread=False)
+            # Nothing to make durable in memory; skip journal and sync work on bulk inserts
+            self.db_connection.execute("PRAGMA journal_mode=MEMORY")
+            self.db_connection.execute("PRAGMA synchronous=OFF")
+        # One connection shared by every thread; queries take turns, LLM calls overlap
+        self._db_lock = threading.Lock()
         self.tables = {}
+        self._schema_cache = None
+        # Compiled quoting pattern for the loaded columns; rebuilt after the next load
+        self._quote_patterns = None
         
     def load_file(self, file_path: str, table_name: str = None) -> str:
         if not table_name:
             table_name = os.path.splitext(os.path.basename(file_path))[0].lower()
         
-        if file_path.endswith('.csv'):
-            df = pd.read_csv(file_path)
+        # Sample rows are only formatted when the schema prompt is built (see get_sample_data)
+        sample_df = None
+        if self.use_duckdb:
+            columns, row_count = self._load_duckdb(file_path, table_name)
+        elif file_path.endswith('.csv'):
+            columns, row_count = self._load_csv(file_path, table_name)
         else:
-            df = pd.read_excel(file_path)
-            
-        df.to_sql(table_name, self.db_connection, if_exists='replace', index=False)
+            df = read_excel(file_path)
+            df.to_sql(table_name, self.db_connection, if_exists='replace', index=False)
+            columns, row_count = list(df.columns), len(df)
+            sample_df = df.head(3)
         
         self.tables[table_name] = {
-            'columns': list(df.columns),
-            'sample_data': df.head(3).to_dict('records')
+            'columns': columns,
+            'sample_df': sample_df,
+            'sample_data': None
         }
+        self._schema_cache = None
+        self._quote_patterns = None
         
-        return f"Loaded {len(df)} rows into table '{table_name}'"
+        return f"Loaded {row_count} rows into table '{table_name}'"
+    
+    def _load_csv(self, file_path: str, table_name: str) -> tuple:
+        """Stream a CSV straight into SQLite, no DataFrame in between"""
+        with open(file_path, newline='', encoding='utf-8-sig') as f:
+            reader = csv.reader(f)
+            columns = next(reader)
+            width = len(columns)
+            table = _quote_identifier(table_name)
+            # NUMERIC affinity stores numeric-looking text as INTEGER/REAL, like pandas' type inference
+            column_defs = ', '.join(f'{_quote_identifier(col)} NUMERIC' for col in columns)
+            insert = f'INSERT INTO {table} VALUES ({", ".join("?" * width)})'
+            row_count = 0
+            with self.db_connection:
+                self.db_connection.execute(f'DROP TABLE IF EXISTS {table}')
+                self.db_connection.execute(f'CREATE TABLE {table} ({column_defs})')
+                while True:
+                    # Empty cells become NULL, as they would via pandas NaN; ragged rows are
+                    # padded (missing trailing fields are NULL) or trimmed to the header's width
+                    batch = [[value if value != '' else None for value in (row + [''] * width)[:width]]
+                             for row in islice(reader, CSV_BATCH_ROWS) if row]
+                    if not batch:
+                        break
+                    self.db_connection.executemany(insert, batch)
+                    row_count += len(batch)
+        return columns, row_count
+    
+    def _load_duckdb(self, file_path: str, table_name: str) -> tuple:
+        """Let DuckDB parse the CSV itself, or take the Excel frame without a row-by-row insert"""
+        table = _quote_identifier(table_name)
+        if file_path.endswith('.csv'):
+            path = file_path.replace("'", "''")
+            self.db_connection.execute(f"CREATE OR REPLACE TABLE {table} AS SELECT * FROM read_csv_auto('{path}')")
+        else:
+            self.db_connection.register('upload_df', read_excel(file_path))
+            try:
+                self.db_connection.execute(f'CREATE OR REPLACE TABLE {table} AS SELECT * FROM upload_df')
+            finally:
+                self.db_connection.unregister('upload_df')
+        columns = [row[0] for row in self.db_connection.execute(f'DESCRIBE {table}').fetchall()]
+        row_count = self.db_connection.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+        return columns, row_count
+    
+    def _run_query(self, sql_query: str) -> pd.DataFrame:
+        with self._db_lock:
+            if self.use_duckdb:
+                # DuckDB quotes identifiers with double quotes, not MySQL-style backticks
+                return self.db_connection.execute(backticks_to_double_quotes(sql_query)).fetchdf()
+            return pd.read_sql_query(sql_query, self.db_connection, **READ_SQL_KWARGS)
     
     def load_excel(self, file_path: str, table_name: str = None) -> str:
         return self.load_file(file_path, table_name)
     
+    def close(self):
+        """Release the Ollama session and the database connection"""
+        self.ollama.close()
+        self.db_connection.close()
+    
+    def get_sample_data(self, table_name: str) -> list:
+        """Return a table's sample rows, formatting (or querying) them on first use"""
+        info = self.tables[table_name]
+        if info['sample_data'] is None:
+            sample_df = info.pop('sample_df', None)
+            if sample_df is None:
+                sample_df = self._run_query(f'SELECT * FROM {_quote_identifier(table_name)} LIMIT 3')
+            info['sample_data'] = sample_df.to_dict('records')
+        return info['sample_data']
+    
     def get_schema_context(self) -> str:
-        context = "DATABASE SCHEMA:\n"
+        if self._schema_cache is not None:
+            return self._schema_cache
+        
+        parts = ["DATABASE SCHEMA:\n"]
         for table_name, info in self.tables.items():
-            context += f"\nTABLE: {table_name}\n"
-            context += f"COLUMNS: {', '.join(info['columns'])}\n"
-            context += f"SAMPLE: {info['sample_data'][0] if info['sample_data'] else 'No data'}\n"
+            sample_data = self.get_sample_data(table_name)
+            parts.append(
+                f"\nTABLE: {table_name}\n"
+                f"COLUMNS: {', '.join(info['columns'])}\n"
+                f"SAMPLE: {prompt_sample(sample_data[0]) if sample_data else 'No data'}\n"
+            )
+        self._schema_cache = context = "".join(parts)
         return context
     
+    def _quote_pattern(self) -> tuple:
+        """One alternation over every column needing quotes (or None), a lowercase -> name map,
+        and the matching Aho-Corasick automaton when pyahocorasick is installed"""
+        if self._quote_patterns is not None:
+            return self._quote_patterns
+        # Deduplicated: a column shared by several tables is matched once
+        columns = {col for table_info in self.tables.values() for col in table_info['columns']}
+        needs = {col for col in columns if ' ' in col or any(char in col for char in ['-', '.', '(', ')'])}
+        # Longest first so "Invoice Number Total" wins over "Invoice Number"; ties alphabetical for a stable pattern
+        ordered = sorted(needs, key=lambda col: (-len(col), col))
+        # Names differing only in case collapse to one alternative
+        names = {}
+        for col in ordered:
+            names.setdefault(col.lower(), col)
+        pattern = None
+        if names:
+            alternation = '|'.join(re.escape(col) for col in names.values())
+            pattern = re.compile(rf'(?<![`\w])({alternation})(?![`\w])', re.IGNORECASE)
+        self._quote_patterns = patterns = (pattern, names, build_automaton(names))
+        return patterns
+    
     def quote_column_names(self, sql: str) -> str:
         """Quote column names that contain spaces or special characters"""
-        # Get all column names from all tables
-        all_columns = []
-        for table_info in self.tables.values():
-            all_columns.extend(table_info['columns'])
-        
-        # Quote columns that need it (contain spaces, special chars)
-        for col in all_columns:
-            if ' ' in col or any(char in col for char in ['-', '.', '(', ')']):
-                # Replace unquoted column references with quoted ones
-                patterns = [
-                    rf'\b{re.escape(col)}\b',  # Exact match
-                    rf'= {re.escape(col)}\b',  # After equals
-                    rf'SELECT {re.escape(col)}\b',  # In SELECT
-                    rf', {re.escape(col)}\b',  # In column list
-                ]
-                for pattern in patterns:
-                    sql = re.sub(pattern, f'`{col}`', sql, flags=re.IGNORECASE)
-        
-        return sql
+        pattern, names, automaton = self._quote_pattern()
+        if pattern is None:
+            return sql
+        if automaton is not None:
+            quoted = quote_with_automaton(sql, automaton)
+            if quoted is not None:
+                return quoted
+        return pattern.sub(lambda m: f'`{names[m.group(1).lower()]}`', sql)
     
     def clean_sql(self, sql: str) -> str:
         # Remove markdown and extra text
-        sql = re.sub(r'```sql\n?|```\n?|SQL:|Query:', '', sql, flags=re.IGNORECASE)
+        sql = _MARKDOWN_RE.sub('', sql[:MAX_SQL_RESPONSE])
         sql = sql.strip()
         
         # Find actual SQL query - look for SELECT, INSERT, UPDATE, DELETE
-        sql_pattern = r'(SELECT.*?(?:;|$)|INSERT.*?(?:;|$)|UPDATE.*?(?:;|$)|DELETE.*?(?:;|$))'
-        match = re.search(sql_pattern, sql, re.IGNORECASE | re.DOTALL)
+        match = _SQL_STATEMENT_RE.search(sql)
         
+        # Quoting is left to execute_query so the SQL is normalized exactly once
         if match:
-            cleaned = match.group(1).strip().rstrip(';')
-            return self.quote_column_names(cleaned)
+            return match.group(0).strip()
         
         # If no SQL found, extract lines that look like SQL
         lines = []
@@ -87,8 +212,7 @@ class DataAnalystAssistant:
                 if line.upper().startswith(('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'FROM', 'WHERE')):
                     lines.append(line)
         
-        cleaned = ' '.join(lines).strip()
-        return self.quote_column_names(cleaned)
+        return ' '.join(lines).strip()
     
     def nl_to_sql(self, question: str) -> str:
         schema = self.get_schema_context()
@@ -112,17 +236,10 @@ IMPORTANT:
 SQL:"""
         
         try:
-            response = requests.post(f"{self.ollama_url}/api/generate", json={
-                "model": "llama3",
-                "prompt": prompt,
-                "stream": False,
-                "options": {"temperature": 0, "num_predict": 50}
-            })
-            
-            if response.status_code == 200:
-                result = response.json()
-                if result and "response" in result and result["response"]:
-                    return self.clean_sql(result["response"])
+            # Stream and hang up at the statement terminator instead of waiting out num_predict
+            response = self.ollama.generate("llama3", prompt, {"temperature": 0, "num_predict": 50}, stop=[";"])
+            if response:
+                return self.clean_sql(response)
         except Exception:
             pass
         
@@ -140,46 +257,19 @@ SQL:"""
         sql_query = sql_query.strip()
         
         # Ensure proper quoting for problematic column names
-        for table_name, info in self.tables.items():
-            for col in info['columns']:
-                if ' ' in col or any(char in col for char in ['-', '.', '(', ')']):
-                    # Replace unquoted references
-                    sql_query = re.sub(rf'\b{re.escape(col)}\b(?!`)', f'`{col}`', sql_query)
-        
-        return sql_query
+        return self.quote_column_names(sql_query)
     
     def execute_query(self, sql_query: str) -> pd.DataFrame:
+        # Quoting is normalized once up front; a failure is only classified, not retried
+        validated_query = self.validate_and_fix_query(sql_query)
         try:
-            # First attempt with validation
-            validated_query = self.validate_and_fix_query(sql_query)
-            return pd.read_sql_query(validated_query, self.db_connection)
+            return self._run_query(validated_query)
         except Exception as e:
             error_msg = str(e).lower()
             
-            if "no such table" in error_msg:
+            if "no such table" in error_msg or ("table with name" in error_msg and "does not exist" in error_msg):
                 available = list(self.tables.keys())
                 raise Exception(f"Table not found. Available: {available}")
-            elif "syntax error" in error_msg and "near" in error_msg:
-                # Try to fix syntax errors by adding quotes around problematic identifiers
-                try:
-                    # More aggressive column name quoting
-                    fixed_query = sql_query
-                    for table_name, info in self.tables.items():
-                        for col in info['columns']:
-                            # Quote any column that might cause issues
-                            patterns = [
-                                rf'\b{re.escape(col)}\b(?![`\w])',  # Not already quoted
-                                rf'= {re.escape(col)}\b',
-                                rf'SELECT {re.escape(col)}\b',
-                                rf', {re.escape(col)}\b',
-                                rf'WHERE {re.escape(col)}\b'
-                            ]
-                            for pattern in patterns:
-                                fixed_query = re.sub(pattern, f'`{col}`', fixed_query, flags=re.IGNORECASE)
-                    
-                    return pd.read_sql_query(fixed_query, self.db_connection)
-                except Exception:
-                    pass
             
             raise Exception(f"Query failed: {str(e)}")
     
@@ -196,17 +286,10 @@ SQL:"""
         prompt = f"Question: {question}\nResults: {summary}\n\nAnswer the question naturally based on the results. Be conversational and helpful."
         
         try:
-            response = requests.post(f"{self.ollama_url}/api/generate", json={
-                "model": "llama3",
-                "prompt": prompt,
-                "stream": False,
-                "options": {"temperature": 0.2, "num_predict": 80}
-            })
-            
-            if response.status_code == 200:
-                result = response.json()
-                if result and "response" in result and result["response"]:
-                    return result["response"].strip()
+            # One paragraph answers the question; stop at the first blank line
+            response = self.ollama.generate("llama3", prompt, {"temperature": 0.2, "num_predict": 80}, stop=["\n\n"])
+            if response:
+                return response.strip()
         except Exception:
             pass
         
@@ -224,7 +307,8 @@ SQL:"""
             return {
                 'question': question,
                 'sql_query': sql_query,
-                'results': results.to_dict('records'),
+                # Columnar: one list per column instead of a dict per row; {} when empty
+                'results': results.to_dict('list') if not results.empty else {},
                 'insights': insights,
                 'success': True
             }
@@ -237,11 +321,11 @@ SQL:"""
                     table_name = list(self.tables.keys())[0] if self.tables else None
                     if table_name:
                         fallback_query = f"SELECT * FROM `{table_name}` LIMIT 5"
-                        results = pd.read_sql_query(fallback_query, self.db_connection)
+                        results = self._run_query(fallback_query)
                         return {
                             'question': question,
                             'sql_query': fallback_query,
-                            'results': results.to_dict('records'),
+                            'results': results.to_dict('list') if not results.empty else {},
                             'insights': f"Had trouble with your query, showing sample data from {table_name} instead.",
                             'success': True,
                             'warning': f"Original error: {str(e)}"
@@ -253,4 +337,8 @@ SQL:"""
                 'question': question,
                 'error': str(e),
                 'success': False
-            }
\ No newline at end of file
+            }
+
+    def analyze_many(self, questions: List[str]) -> List[Dict[str, Any]]:
+        """Analyze several questions concurrently so their Ollama round-trips overlap"""
+        return analyze_many(self.analyze, questions)
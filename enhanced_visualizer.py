@@ -3,9 +3,15 @@ import streamlit as st
 import plotly.express as px
 import plotly.graph_objects as go
 from typing import Dict, List, Tuple, Optional
+from collections import namedtuple
 import re
 import json
 
+_TIME_RE = re.compile(r'year|month|date|quarter|time|period', re.IGNORECASE)
+
+# Everything a chart needs to know about the data, worked out once per visualization
+ChartPlan = namedtuple('ChartPlan', ['chart_type', 'x_col', 'y_col', 'numeric_cols', 'has_time'])
+
 class EnhancedVisualizer:
     def __init__(self):
         self.chart_templates = {
@@ -65,29 +71,42 @@ class EnhancedVisualizer:
             }
         }
     
-    def generate_plotly_code(self, question: str, sql: str, df: pd.DataFrame) -> str:
-        """Generate Plotly code based on question, SQL, and data"""
-        question_lower = question.lower()
-        sql_lower = sql.lower()
+    def plan_chart(self, question: str, sql: str, df: pd.DataFrame) -> ChartPlan:
+        """Classify the data and pick chart type and axes in one pass"""
+        numeric_cols = self._get_numeric_columns(df)
+        time_cols = self._get_time_columns(df)
+        chart_type = self._detect_chart_type(question.lower(), sql.lower(), df, bool(time_cols))
         
-        # Analyze the question and SQL to determine chart type
-        chart_type = self._detect_chart_type(question_lower, sql_lower, df)
+        if chart_type == 'histogram':
+            x_col = numeric_cols[0] if numeric_cols else df.columns[0]
+            y_col = None
+        elif chart_type == 'scatter' and len(numeric_cols) >= 2:
+            x_col, y_col = numeric_cols[0], numeric_cols[1]
+        else:
+            x_col, y_col = self._find_xy_columns(df, numeric_cols, time_cols)
+        
+        return ChartPlan(chart_type, x_col, y_col, numeric_cols, bool(time_cols))
+    
+    def generate_plotly_code(self, question: str, sql: str, df: pd.DataFrame, plan: ChartPlan = None) -> str:
+        """Generate the Plotly code equivalent to the chart create_visualization builds (for display)"""
+        if plan is None:
+            plan = self.plan_chart(question, sql, df)
         
         # Generate appropriate Plotly code
-        if chart_type == 'pie':
-            return self._generate_pie_chart_code(question, df)
-        elif chart_type == 'line':
-            return self._generate_line_chart_code(question, df)
-        elif chart_type == 'bar':
-            return self._generate_bar_chart_code(question, df)
-        elif chart_type == 'scatter':
-            return self._generate_scatter_chart_code(question, df)
-        elif chart_type == 'histogram':
-            return self._generate_histogram_chart_code(question, df)
+        if plan.chart_type == 'pie':
+            return self._generate_pie_chart_code(question, plan.x_col, plan.y_col)
+        elif plan.chart_type == 'line':
+            return self._generate_line_chart_code(question, plan.x_col, plan.y_col)
+        elif plan.chart_type == 'bar':
+            return self._generate_bar_chart_code(question, plan.x_col, plan.y_col)
+        elif plan.chart_type == 'scatter':
+            return self._generate_scatter_chart_code(question, plan.x_col, plan.y_col)
+        elif plan.chart_type == 'histogram':
+            return self._generate_histogram_chart_code(question, plan.x_col)
         else:
-            return self._generate_smart_chart_code(question, df)
+            return self._generate_smart_chart_code(question, df, plan)
     
-    def _detect_chart_type(self, question: str, sql: str, df: pd.DataFrame) -> str:
+    def _detect_chart_type(self, question: str, sql: str, df: pd.DataFrame, has_time: bool = None) -> str:
         """Intelligently detect the best chart type"""
         # Check for specific patterns in question
         for pattern, config in self.chart_templates.items():
@@ -105,7 +124,9 @@ class EnhancedVisualizer:
             return 'bar'
         
         # Check data characteristics
-        if self._has_time_column(df):
+        if has_time is None:
+            has_time = self._has_time_column(df)
+        if has_time:
             return 'line'
         
         if len(df) <= 20:
@@ -113,17 +134,16 @@ class EnhancedVisualizer:
         else:
             return 'line'
     
+    def _get_time_columns(self, df: pd.DataFrame) -> List[str]:
+        """Columns whose name looks time-related, in column order"""
+        return [col for col in df.columns if _TIME_RE.search(str(col))]
+    
     def _has_time_column(self, df: pd.DataFrame) -> bool:
         """Check if dataframe has time-related columns"""
-        time_patterns = ['year', 'month', 'date', 'quarter', 'time', 'period']
-        for col in df.columns:
-            if any(pattern in col.lower() for pattern in time_patterns):
-                return True
-        return False
+        return bool(self._get_time_columns(df))
     
-    def _generate_pie_chart_code(self, question: str, df: pd.DataFrame) -> str:
+    def _generate_pie_chart_code(self, question: str, x_col: str, y_col: str) -> str:
         """Generate code for pie chart"""
-        x_col, y_col = self._find_xy_columns(df)
         style = self.chart_styles['pie']
         
         code = f"""
@@ -160,9 +180,8 @@ fig.update_traces(
 """
         return code
     
-    def _generate_line_chart_code(self, question: str, df: pd.DataFrame) -> str:
+    def _generate_line_chart_code(self, question: str, x_col: str, y_col: str) -> str:
         """Generate code for line chart"""
-        x_col, y_col = self._find_xy_columns(df)
         style = self.chart_styles['line']
         
         code = f"""
@@ -215,9 +234,8 @@ fig.update_traces(
 """
         return code
     
-    def _generate_bar_chart_code(self, question: str, df: pd.DataFrame) -> str:
+    def _generate_bar_chart_code(self, question: str, x_col: str, y_col: str) -> str:
         """Generate code for bar chart"""
-        x_col, y_col = self._find_xy_columns(df)
         style = self.chart_styles['bar']
         
         code = f"""
@@ -248,10 +266,10 @@ fig.update_layout(
     ),
     height={style['height']},
     margin={style['margin']},
-    xaxis={{'categoryorder': 'total descending'}},
     plot_bgcolor='white',
     paper_bgcolor='white',
     xaxis=dict(
+        categoryorder='total descending',
         gridcolor='lightgray',
         showgrid=False,
         zeroline=False
@@ -271,16 +289,10 @@ fig.update_traces(
 """
         return code
     
-    def _generate_scatter_chart_code(self, question: str, df: pd.DataFrame) -> str:
+    def _generate_scatter_chart_code(self, question: str, x_col: str, y_col: str) -> str:
         """Generate code for scatter plot"""
-        numeric_cols = self._get_numeric_columns(df)
         style = self.chart_styles['scatter']
         
-        if len(numeric_cols) >= 2:
-            x_col, y_col = numeric_cols[0], numeric_cols[1]
-        else:
-            x_col, y_col = self._find_xy_columns(df)
-        
         code = f"""
 import plotly.express as px
 
@@ -330,10 +342,8 @@ fig.update_traces(
 """
         return code
     
-    def _generate_histogram_chart_code(self, question: str, df: pd.DataFrame) -> str:
+    def _generate_histogram_chart_code(self, question: str, x_col: str) -> str:
         """Generate code for histogram"""
-        numeric_cols = self._get_numeric_columns(df)
-        x_col = numeric_cols[0] if numeric_cols else df.columns[0]
         style = self.chart_styles['histogram']
         
         code = f"""
@@ -386,52 +396,42 @@ fig.update_traces(
 """
         return code
     
-    def _generate_smart_chart_code(self, question: str, df: pd.DataFrame) -> str:
+    def _generate_smart_chart_code(self, question: str, df: pd.DataFrame, plan: ChartPlan) -> str:
         """Generate smart chart code that adapts to data"""
-        x_col, y_col = self._find_xy_columns(df)
-        
         # Determine best chart type based on data
         if len(df) <= 10:
             chart_type = 'bar'
-        elif self._has_time_column(df):
+        elif plan.has_time:
             chart_type = 'line'
         else:
             chart_type = 'bar'
         
         if chart_type == 'bar':
-            return self._generate_bar_chart_code(question, df)
+            return self._generate_bar_chart_code(question, plan.x_col, plan.y_col)
         else:
-            return self._generate_line_chart_code(question, df)
+            return self._generate_line_chart_code(question, plan.x_col, plan.y_col)
     
     def _get_numeric_columns(self, df: pd.DataFrame) -> List[str]:
         """Get list of numeric columns"""
-        numeric_cols = []
-        for col in df.columns:
-            try:
-                pd.to_numeric(df[col], errors='raise')
-                numeric_cols.append(col)
-            except:
-                continue
-        return numeric_cols
+        # The dtype already says whether a column is numeric; no need to scan its values
+        return [col for col in df.columns if pd.api.types.is_numeric_dtype(df[col])]
     
-    def _find_xy_columns(self, df: pd.DataFrame) -> Tuple[str, str]:
+    def _find_xy_columns(self, df: pd.DataFrame, numeric_cols: List[str] = None,
+                         time_cols: List[str] = None) -> Tuple[str, str]:
         """Find best columns for x and y axes"""
         columns = list(df.columns)
+        if numeric_cols is None:
+            numeric_cols = self._get_numeric_columns(df)
+        if time_cols is None:
+            time_cols = self._get_time_columns(df)
         
         # Look for time columns for x-axis
-        time_patterns = ['year', 'month', 'date', 'quarter', 'time', 'period']
-        x_col = None
-        for col in columns:
-            if any(pattern in col.lower() for pattern in time_patterns):
-                x_col = col
-                break
+        x_col = time_cols[0] if time_cols else None
         
         # If no time column, use first categorical column
         if not x_col:
             for col in columns:
-                try:
-                    pd.to_numeric(df[col], errors='raise')
-                except:
+                if col not in numeric_cols:
                     x_col = col
                     break
         
@@ -440,7 +440,6 @@ fig.update_traces(
         
         # Find numeric column for y-axis
         y_col = None
-        numeric_cols = self._get_numeric_columns(df)
         if numeric_cols:
             for col in numeric_cols:
                 if col != x_col:
@@ -452,27 +451,122 @@ fig.update_traces(
         
         return x_col, y_col
     
-    def get_plotly_figure(self, plotly_code: str, df: pd.DataFrame) -> go.Figure:
-        """Execute the generated Plotly code and return the figure"""
-        try:
-            # Create a local namespace with the dataframe
-            local_vars = {'df': df, 'px': px, 'go': go}
-            
-            # Execute the generated code
-            exec(plotly_code, globals(), local_vars)
-            
-            # Get the figure from local variables
-            fig = local_vars.get('fig')
-            
-            if fig is None:
-                # Fallback to simple chart if code execution fails
-                return self._create_fallback_chart(df, "Generated Chart")
-            
-            return fig
-            
-        except Exception as e:
-            # Silent fallback - no warning to keep UI clean
-            return self._create_fallback_chart(df, "Fallback Chart")
+    def _title(self, question: str) -> dict:
+        return dict(text=question, font=dict(size=18, color='#2E86AB'), x=0.5, xanchor='center')
+    
+    def _axis_title(self, text: str) -> dict:
+        return dict(text=text, font=dict(size=14, color='#2E86AB'))
+    
+    def _build_pie_figure(self, question: str, df: pd.DataFrame, x_col: str, y_col: str) -> go.Figure:
+        style = self.chart_styles['pie']
+        fig = px.pie(data_frame=df, values=y_col, names=x_col, title=question,
+                     color_discrete_sequence=style['colors'])
+        fig.update_layout(
+            title=self._title(question),
+            height=style['height'],
+            margin=style['margin'],
+            showlegend=True,
+            plot_bgcolor='white',
+            paper_bgcolor='white'
+        )
+        fig.update_traces(
+            textposition='inside',
+            textinfo='percent+label',
+            textfont=dict(size=12),
+            marker=dict(line=dict(color='white', width=2))
+        )
+        return fig
+    
+    def _build_line_figure(self, question: str, df: pd.DataFrame, x_col: str, y_col: str) -> go.Figure:
+        style = self.chart_styles['line']
+        fig = px.line(data_frame=df, x=x_col, y=y_col, title=question,
+                      color_discrete_sequence=style['colors'])
+        fig.update_layout(
+            title=self._title(question),
+            xaxis_title=self._axis_title(x_col),
+            yaxis_title=self._axis_title(y_col),
+            height=style['height'],
+            margin=style['margin'],
+            hovermode='x unified',
+            plot_bgcolor='white',
+            paper_bgcolor='white',
+            xaxis=dict(gridcolor='lightgray', showgrid=True, zeroline=False),
+            yaxis=dict(gridcolor='lightgray', showgrid=True, zeroline=False)
+        )
+        fig.update_traces(line=dict(width=3), marker=dict(size=8, color='#2E86AB'))
+        return fig
+    
+    def _build_bar_figure(self, question: str, df: pd.DataFrame, x_col: str, y_col: str) -> go.Figure:
+        style = self.chart_styles['bar']
+        fig = px.bar(data_frame=df, x=x_col, y=y_col, title=question,
+                     color_discrete_sequence=style['colors'])
+        fig.update_layout(
+            title=self._title(question),
+            xaxis_title=self._axis_title(x_col),
+            yaxis_title=self._axis_title(y_col),
+            height=style['height'],
+            margin=style['margin'],
+            plot_bgcolor='white',
+            paper_bgcolor='white',
+            xaxis=dict(categoryorder='total descending', gridcolor='lightgray', showgrid=False, zeroline=False),
+            yaxis=dict(gridcolor='lightgray', showgrid=True, zeroline=False)
+        )
+        fig.update_traces(marker_color='#2E86AB', marker_line_color='#1B4F72', marker_line_width=1)
+        return fig
+    
+    def _build_scatter_figure(self, question: str, df: pd.DataFrame, x_col: str, y_col: str) -> go.Figure:
+        style = self.chart_styles['scatter']
+        fig = px.scatter(data_frame=df, x=x_col, y=y_col, title=question,
+                         color_discrete_sequence=style['colors'])
+        fig.update_layout(
+            title=self._title(question),
+            xaxis_title=self._axis_title(x_col),
+            yaxis_title=self._axis_title(y_col),
+            height=style['height'],
+            margin=style['margin'],
+            plot_bgcolor='white',
+            paper_bgcolor='white',
+            xaxis=dict(gridcolor='lightgray', showgrid=True, zeroline=False),
+            yaxis=dict(gridcolor='lightgray', showgrid=True, zeroline=False)
+        )
+        fig.update_traces(marker=dict(size=10, opacity=0.7, color='#2E86AB'), mode='markers')
+        return fig
+    
+    def _build_histogram_figure(self, question: str, df: pd.DataFrame, x_col: str) -> go.Figure:
+        style = self.chart_styles['histogram']
+        fig = px.histogram(data_frame=df, x=x_col, title=question, nbins=20,
+                           color_discrete_sequence=style['colors'])
+        fig.update_layout(
+            title=self._title(question),
+            xaxis_title=self._axis_title(x_col),
+            yaxis_title=self._axis_title('Frequency'),
+            height=style['height'],
+            margin=style['margin'],
+            plot_bgcolor='white',
+            paper_bgcolor='white',
+            xaxis=dict(gridcolor='lightgray', showgrid=False, zeroline=False),
+            yaxis=dict(gridcolor='lightgray', showgrid=True, zeroline=False)
+        )
+        fig.update_traces(marker_color='#2E86AB', marker_line_color='#1B4F72', marker_line_width=1)
+        return fig
+    
+    def _build_figure(self, question: str, df: pd.DataFrame, plan: ChartPlan) -> go.Figure:
+        """Build the planned chart by calling Plotly directly"""
+        chart_type = plan.chart_type
+        if chart_type not in ('pie', 'line', 'bar', 'scatter', 'histogram'):
+            # Same rule as _generate_smart_chart_code
+            chart_type = 'line' if len(df) > 10 and plan.has_time else 'bar'
+        
+        if chart_type == 'pie':
+            return self._build_pie_figure(question, df, plan.x_col, plan.y_col)
+        elif chart_type == 'line':
+            return self._build_line_figure(question, df, plan.x_col, plan.y_col)
+        elif chart_type == 'scatter':
+            return self._build_scatter_figure(question, df, plan.x_col, plan.y_col)
+        elif chart_type == 'histogram':
+            return self._build_histogram_figure(question, df, plan.x_col)
+        else:
+            return self._build_bar_figure(question, df, plan.x_col, plan.y_col)
     
     def _create_fallback_chart(self, df: pd.DataFrame, title: str) -> go.Figure:
         """Create a fallback chart when code generation fails"""
@@ -519,18 +613,22 @@ fig.update_traces(
             )
             return fig
     
-    def create_visualization(self, question: str, sql: str, df: pd.DataFrame) -> go.Figure:
+    def create_visualization(self, question: str, sql: str, df: pd.DataFrame, plan: ChartPlan = None) -> go.Figure:
         """Main method to create visualization"""
-        # Generate Plotly code
-        plotly_code = self.generate_plotly_code(question, sql, df)
+        if plan is None:
+            plan = self.plan_chart(question, sql, df)
         
-        # Create and return the figure
-        return self.get_plotly_figure(plotly_code, df)
+        try:
+            return self._build_figure(question, df, plan)
+        except Exception:
+            # Silent fallback - no warning to keep UI clean
+            return self._create_fallback_chart(df, "Fallback Chart")
     
-    def get_visualization_explanation(self, question: str, sql: str, df: pd.DataFrame) -> str:
+    def get_visualization_explanation(self, question: str, sql: str, df: pd.DataFrame, plan: ChartPlan = None) -> str:
         """Generate clean explanation of the visualization approach"""
-        chart_type = self._detect_chart_type(question.lower(), sql.lower(), df)
-        x_col, y_col = self._find_xy_columns(df)
+        if plan is None:
+            plan = self.plan_chart(question, sql, df)
+        chart_type, x_col, y_col = plan.chart_type, plan.x_col, plan.y_col
         
         explanations = {
             'pie': f"🥧 **Pie Chart** - Distribution of {y_col} by {x_col}",
@@ -0,0 +1,109 @@
+import re
+import numpy as np
+import pandas as pd
+from typing import Optional, Tuple
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+_TOP_RE = re.compile(r'\b(top|highest|largest|most|best|bottom|lowest|smallest|least|worst)\b(?:\s+(\d+))?', re.IGNORECASE)
+_COUNT_RE = re.compile(r'\b(?:how many|count|number of)\b', re.IGNORECASE)
+# The single value really is a count: the query selects only COUNT(...), or the column is COUNT(...)
+_COUNT_SQL_RE = re.compile(r'^\s*SELECT\s+COUNT\s*\([^()]*\)\s*(?:AS\s+\S+\s*)?FROM\b', re.IGNORECASE)
+_COUNT_COL_RE = re.compile(r'^\s*COUNT\s*\([^()]*\)\s*$', re.IGNORECASE)
+_SUM_RE = re.compile(r'\b(?:sum|total)\b', re.IGNORECASE)
+_ASCENDING_WORDS = {'bottom', 'lowest', 'smallest', 'least', 'worst'}
+
+# Largest grouped result that is still readable as a one-line answer
+MAX_LISTED_GROUPS = 10
+
+if njit is not None:
+    @njit(cache=True)
+    def _sum_by(keys, vals, nkeys):
+        out = np.zeros(nkeys)
+        for i in range(keys.shape[0]):
+            out[keys[i]] += vals[i]
+        return out
+
+    @njit(cache=True)
+    def _argtopk(vals, k):
+        return np.argsort(-vals)[:k]
+
+    @njit(cache=True)
+    def _min_max(vals):
+        # One pass for both ends; NaN never wins a comparison, and a leading NaN is replaced
+        lo = hi = vals[0]
+        for i in range(1, vals.shape[0]):
+            v = vals[i]
+            if v < lo or lo != lo:
+                lo = v
+            if v > hi or hi != hi:
+                hi = v
+        return lo, hi
+else:
+    def _sum_by(keys, vals, nkeys):
+        return np.bincount(keys, weights=vals, minlength=nkeys)
+
+    def _argtopk(vals, k):
+        if k >= len(vals):
+            return np.argsort(-vals, kind='stable')
+        idx = np.argpartition(-vals, k - 1)[:k]
+        return idx[np.argsort(-vals[idx], kind='stable')]
+
+    def _min_max(vals):
+        return np.nanmin(vals), np.nanmax(vals)
+
+
+def min_max(vals: np.ndarray) -> Tuple[float, float]:
+    """Smallest and largest non-NaN value of a non-empty 1-D array in a single scan"""
+    return _min_max(vals)
+
+
+def _fmt(value: float) -> str:
+    return f"{value:,.0f}" if float(value).is_integer() else f"{value:,.2f}"
+
+
+def _is_count(sql_query: str, column) -> bool:
+    return bool(_COUNT_SQL_RE.match(sql_query or '') or _COUNT_COL_RE.match(str(column)))
+
+
+def quick_insight(question: str, results: pd.DataFrame, sql_query: str = None) -> Optional[str]:
+    """Answer simple count/top-N/total questions straight from the results, or None to defer to the LLM"""
+    if results.empty:
+        return None
+
+    numeric = results.select_dtypes(include='number').columns
+    labels = [col for col in results.columns if col not in numeric]
+
+    if _COUNT_RE.search(question) and results.shape == (1, 1) and len(numeric) == 1 \
+            and _is_count(sql_query, results.columns[0]):
+        return f"The count is {_fmt(results.iat[0, 0])}."
+
+    if len(numeric) != 1 or not labels:
+        return None
+
+    value_col, label_col = numeric[0], labels[0]
+    vals = results[value_col].to_numpy(dtype=np.float64)
+    if np.isnan(vals).any():
+        return None
+
+    top = _TOP_RE.search(question)
+    if top:
+        k = min(int(top.group(2) or 5), len(vals))
+        signed = vals if top.group(1).lower() not in _ASCENDING_WORDS else -vals
+        idx = _argtopk(signed, k)
+        names = results[label_col].to_numpy()
+        items = ", ".join(f"{names[i]} ({_fmt(vals[i])})" for i in idx)
+        return f"{'Bottom' if signed is not vals else 'Top'} {k} by {value_col}: {items}."
+
+    if _SUM_RE.search(question):
+        codes, uniques = pd.factorize(results[label_col])
+        if len(uniques) > MAX_LISTED_GROUPS or (codes < 0).any():
+            return None
+        sums = _sum_by(codes.astype(np.int64), vals, len(uniques))
+        items = "; ".join(f"{name}: {_fmt(total)}" for name, total in zip(uniques, sums))
+        return f"{value_col} by {label_col} - {items}."
+
+    return None
@@ -0,0 +1,169 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# (connect, read) timeouts for /api/generate calls
+GENERATE_TIMEOUT = (3, 120)
+# Keep the model (and its prompt KV cache) resident between questions
+KEEP_ALIVE = "30m"
+# Questions analyzed at once by analyze_many; each mostly waits on Ollama
+ANALYZE_WORKERS = 4
+
+
+def create_session(ollama_url: str) -> requests.Session:
+    """Create a keep-alive session with a pooled adapter mounted on the Ollama URL"""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=16,
+        pool_maxsize=32,
+        max_retries=Retry(total=2, backoff_factor=0.2)
+    )
+    session.mount(ollama_url, adapter)
+    session.headers.update({"Connection": "keep-alive"})
+    return session
+
+
+def analyze_many(analyze: Callable, questions: List[str]) -> list:
+    """Run analyze over several questions on a small pool so their Ollama round-trips overlap"""
+    with ThreadPoolExecutor(max_workers=min(ANALYZE_WORKERS, len(questions)) or 1) as executor:
+        return list(executor.map(analyze, questions))
+
+
+class OllamaClient:
+    """/api/generate wrapper that memoizes responses by (model, prompt, options)"""
+
+    def __init__(self, ollama_url: str, cache_size: int = 1024, cache_ttl: float = 3600):
+        self.ollama_url = ollama_url
+        self.session = create_session(ollama_url)
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _cache_key(model: str, prompt: str, options: Optional[Dict]) -> bytes:
+        payload = json.dumps([model, prompt, options], sort_keys=True).encode()
+        return hashlib.blake2b(payload, digest_size=16).digest()
+
+    def _cache_get(self, key: bytes) -> Optional[str]:
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            expires, text = entry
+            if expires < time.monotonic():
+                del self._cache[key]
+                return None
+            self._cache.move_to_end(key)
+            return text
+
+    def _cache_put(self, key: bytes, text: str):
+        with self._lock:
+            self._cache[key] = (time.monotonic() + self.cache_ttl, text)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _stream(self, body: Dict, stop: List[str]) -> Optional[str]:
+        """Accumulate a streamed response, hanging up as soon as a stop sequence shows up"""
+        text = ""
+        with self.session.post(f"{self.ollama_url}/api/generate", json=body,
+                               timeout=GENERATE_TIMEOUT, stream=True) as response:
+            if response.status_code != 200:
+                return None
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                text += chunk.get("response", "")
+                if chunk.get("done"):
+                    break
+                cut = min((text.find(s) for s in stop if s in text), default=-1)
+                if cut >= 0:
+                    text = text[:cut]
+                    break
+        return text
+
+    def generate(self, model: str, prompt: str, options: Optional[Dict] = None,
+                 stop: Optional[List[str]] = None) -> Optional[str]:
+        """Return the model's response text, or None if Ollama gave no usable answer.
+
+        With stop sequences the response is streamed and cut at the first one,
+        so short answers don't wait for the num_predict cap. Connection errors
+        propagate so callers can fall back the same way they did around a bare
+        requests.post.
+        """
+        if stop:
+            options = dict(options or {}, stop=stop)
+        key = self._cache_key(model, prompt, options)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+
+        body = {"model": model, "prompt": prompt, "stream": bool(stop), "keep_alive": KEEP_ALIVE}
+        if options:
+            body["options"] = options
+
+        if stop:
+            text = self._stream(body, stop)
+        else:
+            response = self.session.post(f"{self.ollama_url}/api/generate", json=body, timeout=GENERATE_TIMEOUT)
+            if response.status_code != 200:
+                return None
+            result = response.json()
+            text = result.get("response") if result else None
+
+        if not text:
+            return None
+        self._cache_put(key, text)
+        return text
+
+    def generate_stream(self, model: str, prompt: str, options: Optional[Dict] = None) -> Iterator[str]:
+        """Yield the response text as Ollama produces it; a cached answer comes back as one chunk.
+
+        Shares generate's cache: the full text is stored once the stream finishes,
+        and nothing is stored if the caller stops reading early.
+        """
+        key = self._cache_key(model, prompt, options)
+        cached = self._cache_get(key)
+        if cached is not None:
+            yield cached
+            return
+
+        body = {"model": model, "prompt": prompt, "stream": True, "keep_alive": KEEP_ALIVE}
+        if options:
+            body["options"] = options
+
+        parts = []
+        with self.session.post(f"{self.ollama_url}/api/generate", json=body,
+                               timeout=GENERATE_TIMEOUT, stream=True) as response:
+            if response.status_code != 200:
+                return
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                text = chunk.get("response", "")
+                if text:
+                    parts.append(text)
+                    yield text
+                if chunk.get("done"):
+                    break
+        if parts:
+            self._cache_put(key, "".join(parts))
+
+    def clear_cache(self):
+        with self._lock:
+            self._cache.clear()
+
+    def close(self):
+        """Release the pooled connections"""
+        self.session.close()
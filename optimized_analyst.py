@@ -1,69 +1,227 @@
 import pandas as pd
 import sqlite3
-import requests
-from typing import Dict, Any
+from ollama_client import OllamaClient, analyze_many
+from fast_agg import min_max
+from backends import SQLITE_PRAGMAS
+from sql_quoting import has_limit
+from typing import Dict, Any, List, Optional
 import os
 import json
 import re
+import threading
+from collections import OrderedDict
+from itertools import islice
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:
+    pa = None
+    pa_csv = None
+
+# Generated SQL remembered per normalized question until the next load_file
+SQL_CACHE_SIZE = 512
+# SELECT results remembered per SQL string until the tables change
+RESULT_CACHE_SIZE = 64
+# Rows per chunk when pandas streams a CSV into SQLite
+CSV_CHUNK_ROWS = 100_000
+# Single-column results at least this long get the fused min/max scan
+MIN_MAX_SCAN_ROWS = 10_000
+# LIMIT added to generated SELECTs that don't bound their own result
+MAX_RESULT_ROWS = 10_000
+# What a query run through execute_query may do: read tables, call functions, list columns
+_READ_ACTIONS = {sqlite3.SQLITE_SELECT, sqlite3.SQLITE_READ, sqlite3.SQLITE_FUNCTION, sqlite3.SQLITE_RECURSIVE}
+_READ_PRAGMAS = {'table_info', 'table_xinfo', 'index_list', 'index_info'}
+_READ_ONLY_RE = re.compile(r'^\s*(?:SELECT|WITH)\b', re.IGNORECASE)
+_MARKDOWN_RE = re.compile(r'```sql\n?|```\n?|SQL:|Query:', re.IGNORECASE)
+_SKIP_LINE_RE = re.compile(r'#|--|note', re.IGNORECASE)
+_SQL_HEAD_RE = re.compile(r'^\s*(SELECT|WITH|INSERT|UPDATE|DELETE)', re.IGNORECASE)
+_SQL_EXTRACT_RE = re.compile(r'(SELECT.*?(?:;|$))', re.IGNORECASE | re.DOTALL)
+# Whole-question templates answered without the LLM; anchored so "count sales by region" still goes to the model
+_TEMPLATE_RE = re.compile(
+    r'^(?:(?P<count>(?:how many (?:rows|records|entries)(?: are there)?|count(?: all)?(?: the)? (?:rows|records|entries)'
+    r'|(?:what is )?the total number of (?:rows|records))(?: in (?:the )?(?:table|data(?:set)?))?\??)'
+    r'|(?P<first>(?:show|display|list)(?: me)? the (?:first|top) (?P<n>\d+) (?:rows|records))'
+    r'|(?P<columns>(?:what|which|show|list)(?: are)?(?: me)?(?: the)? (?:columns|schema)\??))$'
+)
+# Keyword buckets for the no-LLM fallback; lookaheads report every bucket present in one match
+_FALLBACK_RE = re.compile(r'^(?=.*?(?P<count>count|how many|total))?(?=.*?(?P<top>top|highest|maximum|best))?', re.DOTALL)
+
+
+def _quote_identifier(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _sqlite_type(arrow_type) -> str:
+    if pa.types.is_integer(arrow_type) or pa.types.is_boolean(arrow_type):
+        return 'INTEGER'
+    if pa.types.is_floating(arrow_type):
+        return 'REAL'
+    return 'TEXT'
+
+
+def _sqlite_values(column) -> list:
+    # Dates and timestamps are stored as text, the way pandas writes datetimes to SQLite
+    if pa.types.is_temporal(column.type):
+        column = column.cast(pa.string())
+    return column.to_pylist()
 
 class OptimizedDataAnalyst:
-    def __init__(self, ollama_url: str = "http://localhost:11434"):
+    def __init__(self, ollama_url: str = "http://localhost:11434", chunksize: int = CSV_CHUNK_ROWS,
+                 max_rows: int = MAX_RESULT_ROWS):
         self.ollama_url = ollama_url
+        self.chunksize = chunksize
+        self.max_rows = max_rows
+        # Keep-alive session shared by every Ollama call
+        self.ollama = OllamaClient(ollama_url)
         self.db_connection = sqlite3.connect(':memory:', check_same_thread=False)
+        # Nothing to make durable in memory; keep the journal in RAM and skip sync work
+        self.db_connection.execute("PRAGMA journal_mode=MEMORY")
+        for pragma in SQLITE_PRAGMAS:
+            self.db_connection.execute(pragma)
+        # One sqlite3 connection is shared by analyze_many's worker threads
+        self._db_lock = threading.Lock()
+        # Set while execute_query runs so model-written SQL can't change the data
+        self._read_only = False
+        self.db_connection.set_authorizer(self._authorize)
         self.tables = {}
+        # Both caches depend on the loaded tables and are dropped by load_file
+        self._schema_cache = None
+        self._sql_cache = OrderedDict()
+        self._sql_cache_lock = threading.Lock()
+        self._result_cache = OrderedDict()
+        # Questions answered by _template_match without an LLM call
+        self.template_hits = 0
         
+    def _authorize(self, action, arg1, arg2, db_name, trigger):
+        if not self._read_only or action in _READ_ACTIONS:
+            return sqlite3.SQLITE_OK
+        if action == sqlite3.SQLITE_PRAGMA and arg1 in _READ_PRAGMAS:
+            return sqlite3.SQLITE_OK
+        return sqlite3.SQLITE_DENY
+    
     def load_file(self, file_path: str, table_name: str = None) -> str:
         if not table_name:
             table_name = os.path.splitext(os.path.basename(file_path))[0].lower()
         
-        if file_path.endswith('.csv'):
-            df = pd.read_csv(file_path)
-        else:
-            df = pd.read_excel(file_path)
-            
-        df.to_sql(table_name, self.db_connection, if_exists='replace', index=False)
+        loaded = None
+        if file_path.endswith('.csv') and pa_csv is not None:
+            try:
+                loaded = self._load_csv_arrow(file_path, table_name)
+            except pa.ArrowInvalid:
+                # pyarrow couldn't settle on column types; pandas is more forgiving
+                pass
+        if loaded is None:
+            loaded = self._load_pandas(file_path, table_name)
+        columns, row_count, sample_data = loaded
         
+        # The table's part of the prompt only changes on reload, so format it once here
+        schema_snippet = (
+            f"\nTABLE: {table_name} ({row_count} rows)\n"
+            f"COLUMNS: {', '.join(columns)}\n"
+            "SAMPLE DATA:\n"
+            + "".join(f"  {row}\n" for row in sample_data[:2])
+        )
         self.tables[table_name] = {
-            'columns': list(df.columns),
-            'sample_data': df.head(3).to_dict('records'),
-            'row_count': len(df)
+            'columns': columns,
+            'sample_data': sample_data,
+            'row_count': row_count,
+            'schema_snippet': schema_snippet
         }
+        self._schema_cache = None
+        with self._sql_cache_lock:
+            self._sql_cache.clear()
+        
+        return f"Loaded {row_count} rows into table '{table_name}'"
+    
+    def _load_pandas(self, file_path: str, table_name: str) -> tuple:
+        # CSVs are read chunksize rows at a time so peak memory stays bounded
+        if file_path.endswith('.csv'):
+            chunks = pd.read_csv(file_path, chunksize=self.chunksize)
+        else:
+            chunks = [pd.read_excel(file_path)]
         
-        return f"Loaded {len(df)} rows into table '{table_name}'"
+        columns, row_count, sample_data = [], 0, []
+        with self._db_lock:
+            for i, chunk in enumerate(chunks):
+                chunk.to_sql(table_name, self.db_connection, if_exists='replace' if i == 0 else 'append', index=False)
+                if i == 0:
+                    columns = list(chunk.columns)
+                    sample_data = [dict(zip(columns, row))
+                                   for row in chunk.head(3).itertuples(index=False, name=None)]
+                row_count += len(chunk)
+            self._result_cache.clear()
+        return columns, row_count, sample_data
+    
+    def _load_csv_arrow(self, file_path: str, table_name: str) -> tuple:
+        """Stream the CSV through pyarrow batch by batch, bulk inserting each with executemany"""
+        # Empty cells become NULL, as they would via pandas NaN
+        reader = pa_csv.open_csv(file_path, convert_options=pa_csv.ConvertOptions(strings_can_be_null=True))
+        columns = reader.schema.names
+        column_defs = ', '.join(f'{_quote_identifier(field.name)} {_sqlite_type(field.type)}'
+                                for field in reader.schema)
+        quoted_table = _quote_identifier(table_name)
+        insert = f'INSERT INTO {quoted_table} VALUES ({", ".join("?" * len(columns))})'
+        
+        row_count, sample_data = 0, []
+        with self._db_lock, self.db_connection:
+            self.db_connection.execute(f'DROP TABLE IF EXISTS {quoted_table}')
+            self.db_connection.execute(f'CREATE TABLE {quoted_table} ({column_defs})')
+            for batch in reader:
+                values = [_sqlite_values(col) for col in batch.columns]
+                self.db_connection.executemany(insert, zip(*values))
+                if len(sample_data) < 3:
+                    sample_data += [dict(zip(columns, row)) for row in islice(zip(*values), 3 - len(sample_data))]
+                row_count += batch.num_rows
+            self._result_cache.clear()
+        return columns, row_count, sample_data
     
     def get_enhanced_schema(self) -> str:
-        context = "DATABASE SCHEMA:\n"
-        for table_name, info in self.tables.items():
-            context += f"\nTABLE: {table_name} ({info['row_count']} rows)\n"
-            context += f"COLUMNS: {', '.join(info['columns'])}\n"
-            context += "SAMPLE DATA:\n"
-            for i, row in enumerate(info['sample_data'][:2]):
-                context += f"  {row}\n"
+        if self._schema_cache is not None:
+            return self._schema_cache
+        
+        context = "DATABASE SCHEMA:\n" + "".join(info['schema_snippet'] for info in self.tables.values())
+        self._schema_cache = context
         return context
     
     def clean_sql(self, sql: str) -> str:
         """Clean and validate SQL query"""
         # Remove markdown and extra text
-        sql = re.sub(r'```sql\n?|```\n?|SQL:|Query:', '', sql, flags=re.IGNORECASE)
+        sql = _MARKDOWN_RE.sub('', sql)
         sql = sql.strip()
         
-        # Extract only SQL lines
-        lines = []
-        for line in sql.split('\n'):
-            line = line.strip()
-            if line and not line.startswith('#') and not line.startswith('--') and not line.lower().startswith('note'):
-                lines.append(line)
-        
-        sql = ' '.join(lines)
+        # Extract only SQL lines, dropping comments and notes
+        lines = [line.strip() for line in sql.split('\n')]
+        sql = ' '.join(line for line in lines if line and not _SKIP_LINE_RE.match(line))
         
-        # Ensure it starts with SELECT, INSERT, UPDATE, DELETE
-        if not re.match(r'^\s*(SELECT|INSERT|UPDATE|DELETE)', sql, re.IGNORECASE):
+        # Ensure it starts with SELECT, WITH, INSERT, UPDATE, DELETE
+        if not _SQL_HEAD_RE.match(sql):
             # Try to find SQL in the text
-            sql_match = re.search(r'(SELECT.*?(?:;|$))', sql, re.IGNORECASE | re.DOTALL)
+            sql_match = _SQL_EXTRACT_RE.search(sql)
             if sql_match:
                 sql = sql_match.group(1)
         
-        return sql.strip()
+        sql = sql.strip()
+        # Bound unbounded reads so a runaway SELECT can't materialize the whole table
+        statement, semicolon, rest = sql.partition(';')
+        if _READ_ONLY_RE.match(sql) and not has_limit(statement):
+            sql = f"{statement.rstrip()} LIMIT {self.max_rows}{semicolon}{rest}"
+        return sql
+    
+    def _template_match(self, question: str, table_names: List[str]) -> Optional[str]:
+        """Canned SQL for a few fixed questions about a single loaded table, or None"""
+        if len(table_names) != 1:
+            return None
+        table = _quote_identifier(table_names[0])
+        
+        template = _TEMPLATE_RE.match(question)
+        if template is None:
+            return None
+        if template.group('count'):
+            return f"SELECT COUNT(*) FROM {table};"
+        if template.group('first'):
+            return f"SELECT * FROM {table} LIMIT {int(template.group('n'))};"
+        return f"PRAGMA table_info({table});"
     
     def nl_to_sql(self, question: str) -> str:
         schema = self.get_enhanced_schema()
@@ -72,6 +230,17 @@ class OptimizedDataAnalyst:
         if not table_names:
             raise Exception("No tables loaded. Please upload a file first.")
         
+        # Same question against the same tables: reuse the SQL without prompting again
+        cache_key = " ".join(question.lower().split())
+        template_sql = self._template_match(cache_key, table_names)
+        if template_sql:
+            self.template_hits += 1
+            return template_sql
+        with self._sql_cache_lock:
+            if cache_key in self._sql_cache:
+                self._sql_cache.move_to_end(cache_key)
+                return self._sql_cache[cache_key]
+        
         # Enhanced prompt with examples
         prompt = f"""{schema}
 
@@ -94,40 +263,66 @@ EXAMPLES:
 SQL QUERY:"""
         
         try:
-            response = requests.post(f"{self.ollama_url}/api/generate", json={
-                "model": "llama3",
-                "prompt": prompt,
-                "stream": False,
-                "options": {
-                    "temperature": 0.1,
-                    "top_p": 0.9,
-                    "max_tokens": 150
-                }
-            })
+            # Streamed and cut at the first ';' - the statement is complete there
+            response = self.ollama.generate("llama3", prompt, {
+                "temperature": 0.1,
+                "top_p": 0.9,
+                "max_tokens": 150
+            }, stop=[";"])
             
-            if response.status_code == 200:
-                result = response.json()
-                if result and "response" in result and result["response"]:
-                    sql = self.clean_sql(result["response"])
-                    return sql
+            if response:
+                sql = self.clean_sql(response)
+                with self._sql_cache_lock:
+                    self._sql_cache[cache_key] = sql
+                    if len(self._sql_cache) > SQL_CACHE_SIZE:
+                        self._sql_cache.popitem(last=False)
+                return sql
         except Exception as e:
             print(f"LLM Error: {e}")
         
         # Smart fallback based on question
-        if any(word in question.lower() for word in ['count', 'how many', 'total']):
+        buckets = _FALLBACK_RE.match(question.lower())
+        if buckets.group('count'):
             return f"SELECT COUNT(*) FROM {table_names[0]};"
-        elif any(word in question.lower() for word in ['top', 'highest', 'maximum', 'best']):
+        elif buckets.group('top'):
             return f"SELECT * FROM {table_names[0]} LIMIT 10;"
         else:
             return f"SELECT * FROM {table_names[0]} LIMIT 5;"
     
     def execute_query(self, sql_query: str) -> pd.DataFrame:
+        read_only = bool(_READ_ONLY_RE.match(sql_query))
         try:
-            return pd.read_sql_query(sql_query, self.db_connection)
+            with self._db_lock:
+                if read_only and sql_query in self._result_cache:
+                    self._result_cache.move_to_end(sql_query)
+                    return self._result_cache[sql_query].copy(deep=False)
+                
+                # Build the frame straight from the cursor; sqlite3 reuses the compiled statement
+                self._read_only = True
+                try:
+                    cursor = self.db_connection.execute(sql_query)
+                    try:
+                        columns = [col[0] for col in cursor.description]
+                        rows = cursor.fetchall()
+                    finally:
+                        cursor.close()
+                finally:
+                    self._read_only = False
+            
+            # Only the connection needs the lock; other analyze_many workers can query meanwhile
+            results = pd.DataFrame.from_records(rows, columns=columns)
+            if read_only:
+                with self._db_lock:
+                    self._result_cache[sql_query] = results
+                    if len(self._result_cache) > RESULT_CACHE_SIZE:
+                        self._result_cache.popitem(last=False)
+            return results.copy(deep=False)
         except Exception as e:
             if "no such table" in str(e).lower():
                 available = list(self.tables.keys())
                 raise Exception(f"Table not found. Available: {available}")
+            if "not authorized" in str(e).lower():
+                raise Exception("Only read-only queries are allowed")
             raise Exception(f"SQL Error: {str(e)}")
     
     def generate_simple_insights(self, question: str, results: pd.DataFrame) -> str:
@@ -142,7 +337,11 @@ SQL QUERY:"""
             if len(results.columns) == 1:
                 col = results.columns[0]
                 if results[col].dtype in ['int64', 'float64']:
-                    insight += f"Values range from {results[col].min()} to {results[col].max()}."
+                    if len(results) >= MIN_MAX_SCAN_ROWS:
+                        low, high = min_max(results[col].to_numpy())
+                    else:
+                        low, high = results[col].min(), results[col].max()
+                    insight += f"Values range from {low} to {high}."
                 else:
                     insight += f"Sample values: {list(results[col].head(3))}."
             else:
@@ -151,7 +350,8 @@ SQL QUERY:"""
         
         return insight
     
-    def analyze(self, question: str) -> Dict[str, Any]:
+    def analyze(self, question: str, serialize: bool = False) -> Dict[str, Any]:
+        """Answer a question; results is the DataFrame itself unless serialize asks for plain lists"""
         try:
             sql_query = self.nl_to_sql(question)
             results = self.execute_query(sql_query)
@@ -160,7 +360,8 @@ SQL QUERY:"""
             return {
                 'question': question,
                 'sql_query': sql_query,
-                'results': results.to_dict('records'),
+                # Columnar lists (one per column) when a plain-Python payload is needed
+                'results': results.to_dict('list') if serialize else results,
                 'insights': insights,
                 'success': True
             }
@@ -171,6 +372,10 @@ SQL QUERY:"""
                 'error': str(e),
                 'success': False
             }
+    
+    def analyze_many(self, questions: List[str]) -> List[Dict[str, Any]]:
+        """Analyze several questions concurrently: LLM calls, SQL and insights all run on the pool"""
+        return analyze_many(self.analyze, questions)
 
 # Test the optimized version
 if __name__ == "__main__":
@@ -1,10 +1,24 @@
 import sqlite3
-import requests
 import json
+import threading
+from ollama_client import OllamaClient, analyze_many
+
+# In-memory database: no durability to protect, so skip sync work and keep temp data in RAM
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=MEMORY",
+    "PRAGMA synchronous=OFF",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-65536",
+)
 
 class SimpleAnalyst:
-    def __init__(self):
-        self.db = sqlite3.connect(':memory:')
+    def __init__(self, ollama_url="http://localhost:11434"):
+        self.db = sqlite3.connect(':memory:', check_same_thread=False)
+        for pragma in SQLITE_PRAGMAS:
+            self.db.execute(pragma)
+        # analyze_many's worker threads share the one connection
+        self._db_lock = threading.Lock()
+        self.ollama = OllamaClient(ollama_url)
         
     def load_csv(self, file_path, table_name):
         """Load CSV into SQLite"""
@@ -15,16 +29,17 @@ class SimpleAnalyst:
     
     def get_tables(self):
         """Get table info"""
-        cursor = self.db.cursor()
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-        tables = cursor.fetchall()
-        
-        info = {}
-        for table in tables:
-            table_name = table[0]
-            cursor.execute(f"PRAGMA table_info({table_name})")
-            columns = [col[1] for col in cursor.fetchall()]
-            info[table_name] = columns
+        with self._db_lock:
+            cursor = self.db.cursor()
+            cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
+            tables = cursor.fetchall()
+            
+            info = {}
+            for table in tables:
+                table_name = table[0]
+                cursor.execute(f"PRAGMA table_info({table_name})")
+                columns = [col[1] for col in cursor.fetchall()]
+                info[table_name] = columns
         return info
     
     def nl_to_sql(self, question):
@@ -34,19 +49,18 @@ class SimpleAnalyst:
         
         prompt = f"Schema:\n{schema}\n\nQuestion: {question}\n\nSQL (only the query):"
         
-        response = requests.post("http://localhost:11434/api/generate", json={
-            "model": "llama3",
-            "prompt": prompt,
-            "stream": False
-        })
+        response = self.ollama.generate("llama3", prompt)
+        if not response:
+            raise Exception("Ollama returned no SQL")
         
-        return response.json()["response"].strip()
+        return response.strip()
     
     def execute_sql(self, sql):
         """Execute SQL query"""
-        cursor = self.db.cursor()
-        cursor.execute(sql)
-        return cursor.fetchall()
+        with self._db_lock:
+            cursor = self.db.cursor()
+            cursor.execute(sql)
+            return cursor.fetchall()
     
     def analyze(self, question):
         """Full analysis pipeline"""
@@ -56,6 +70,10 @@ class SimpleAnalyst:
             return {"sql": sql, "results": results, "success": True}
         except Exception as e:
             return {"error": str(e), "success": False}
+    
+    def analyze_many(self, questions):
+        """Analyze several questions concurrently so their Ollama round-trips overlap"""
+        return analyze_many(self.analyze, questions)
 
 # Test
 if __name__ == "__main__":
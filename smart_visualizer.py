@@ -1,10 +1,33 @@
+import numpy as np
 import pandas as pd
-import streamlit as st
-import plotly.express as px
-import plotly.graph_objects as go
-from typing import Dict, List, Tuple, Optional
+from typing import TYPE_CHECKING, Dict, List, Tuple, Optional
 import re
 
+if TYPE_CHECKING:
+    import plotly.graph_objects as go
+
+# Plotly takes a noticeable while to import; _load_plotly fills these in on the first chart
+_px = None
+_go = None
+
+
+def _load_plotly():
+    global _px, _go
+    if _px is None:
+        import plotly.express
+        import plotly.graph_objects
+        _px, _go = plotly.express, plotly.graph_objects
+
+_TIME_COL_RE = re.compile(r'year|month|date|quarter|time|period', re.IGNORECASE)
+# Chart keyword buckets for detect_chart_type; lookaheads report every bucket present in one match
+_CHART_KW_RE = re.compile(
+    r'^(?=.*?(?P<time>year|month|date|quarter|time|trend))?'
+    r'(?=.*?(?P<cmp>compare|vs|versus|difference))?'
+    r'(?=.*?(?P<dist>distribution|frequency|histogram))?'
+    r'(?=.*?(?P<corr>correlation|relationship|scatter))?',
+    re.IGNORECASE | re.DOTALL
+)
+
 class SmartVisualizer:
     def __init__(self):
         self.chart_types = {
@@ -23,9 +46,10 @@ class SmartVisualizer:
     def detect_chart_type(self, sql_query: str, results: pd.DataFrame) -> str:
         """Intelligently detect the best chart type based on query and data"""
         query_lower = sql_query.lower()
+        keywords = _CHART_KW_RE.match(query_lower)
         
         # Check for time-based queries
-        if any(time_word in query_lower for time_word in ['year', 'month', 'date', 'quarter', 'time', 'trend']):
+        if keywords.group('time'):
             if len(results) > 1:  # Multiple time points
                 return 'line'
             else:
@@ -39,15 +63,15 @@ class SmartVisualizer:
                 return 'line'
         
         # Check for comparison queries
-        if any(word in query_lower for word in ['compare', 'vs', 'versus', 'difference']):
+        if keywords.group('cmp'):
             return 'bar'
         
         # Check for distribution queries
-        if any(word in query_lower for word in ['distribution', 'frequency', 'histogram']):
+        if keywords.group('dist'):
             return 'histogram'
         
         # Check for correlation queries
-        if any(word in query_lower for word in ['correlation', 'relationship', 'scatter']):
+        if keywords.group('corr'):
             return 'scatter'
         
         # Default to bar chart for grouped data
@@ -56,36 +80,39 @@ class SmartVisualizer:
         else:
             return 'line'
     
-    def create_visualization(self, sql_query: str, results: pd.DataFrame, question: str) -> Optional[go.Figure]:
+    def create_visualization(self, sql_query: str, results: pd.DataFrame, question: str) -> Optional['go.Figure']:
         """Create an appropriate visualization for ANY data"""
+        _load_plotly()
         if results.empty or len(results) == 0:
             return self._create_empty_chart(question)
         
         chart_type = self.detect_chart_type(sql_query, results)
+        # Classify the columns once and hand the result to whichever builder runs
+        numeric_cols = self._get_numeric_columns(results)
         
         try:
             if chart_type == 'line':
-                return self._create_line_chart(results, question)
+                return self._create_line_chart(results, question, numeric_cols)
             elif chart_type == 'bar':
-                return self._create_bar_chart(results, question)
+                return self._create_bar_chart(results, question, numeric_cols)
             elif chart_type == 'pie':
-                return self._create_pie_chart(results, question)
+                return self._create_pie_chart(results, question, numeric_cols)
             elif chart_type == 'scatter':
-                return self._create_scatter_chart(results, question)
+                return self._create_scatter_chart(results, question, numeric_cols)
             elif chart_type == 'histogram':
-                return self._create_histogram(results, question)
+                return self._create_histogram(results, question, numeric_cols)
             else:
-                return self._create_bar_chart(results, question)  # Default fallback
+                return self._create_bar_chart(results, question, numeric_cols)  # Default fallback
         except Exception as e:
             # If any chart fails, try to create a simple bar chart
             try:
-                return self._create_simple_bar_chart(results, question)
+                return self._create_simple_bar_chart(results, question, numeric_cols)
             except:
                 return self._create_empty_chart(question)
     
-    def _create_empty_chart(self, question: str) -> go.Figure:
+    def _create_empty_chart(self, question: str) -> 'go.Figure':
         """Create a chart for empty results"""
-        fig = go.Figure()
+        fig = _go.Figure()
         fig.add_annotation(
             text="No data to visualize",
             xref="paper", yref="paper",
@@ -100,29 +127,37 @@ class SmartVisualizer:
         )
         return fig
     
-    def _create_simple_bar_chart(self, results: pd.DataFrame, question: str) -> go.Figure:
+    def _get_numeric_columns(self, results: pd.DataFrame) -> List[str]:
+        """Numeric columns with at least one value, decided by dtype rather than per-value coercion"""
+        numeric = results.select_dtypes(include='number')
+        return numeric.columns[numeric.notna().any()].tolist()
+    
+    def _numeric_values(self, results: pd.DataFrame, col: str) -> np.ndarray:
+        """Column as a NumPy array with gaps as 0; only non-numeric columns go through to_numeric"""
+        values = results[col]
+        if not pd.api.types.is_numeric_dtype(values):
+            values = pd.to_numeric(values, errors='coerce')
+        return values.fillna(0).to_numpy()
+    
+    def _create_simple_bar_chart(self, results: pd.DataFrame, question: str,
+                                 numeric_cols: List[str] = None) -> 'go.Figure':
         """Create a simple bar chart that works with any data"""
         try:
+            if numeric_cols is None:
+                numeric_cols = self._get_numeric_columns(results)
             # Convert all data to strings for x-axis
             x_col = results.columns[0]
             y_data = []
             
-            # Try to extract numerical values from any column
-            for col in results.columns:
-                try:
-                    # Convert to numeric, ignoring errors
-                    numeric_data = pd.to_numeric(results[col], errors='coerce')
-                    if not numeric_data.isna().all():
-                        y_data = numeric_data.fillna(0)
-                        break
-                except:
-                    continue
+            # Use the first column that holds numbers
+            if numeric_cols:
+                y_data = self._numeric_values(results, numeric_cols[0])
             
             if len(y_data) == 0:
                 # If no numeric data, create a count chart
                 y_data = [1] * len(results)
             
-            fig = px.bar(x=results[x_col].astype(str), y=y_data, title=f"Data Overview: {question}")
+            fig = _px.bar(x=results[x_col].astype(str), y=y_data, title=f"Data Overview: {question}")
             fig.update_layout(
                 xaxis_title=x_col,
                 yaxis_title="Value/Count",
@@ -132,15 +167,16 @@ class SmartVisualizer:
         except:
             return self._create_empty_chart(question)
     
-    def _create_line_chart(self, results: pd.DataFrame, question: str) -> go.Figure:
+    def _create_line_chart(self, results: pd.DataFrame, question: str,
+                           numeric_cols: List[str] = None) -> 'go.Figure':
         """Create a line chart for time series or sequential data"""
         try:
-            x_col, y_col = self._find_xy_columns(results)
+            x_col, y_col = self._find_xy_columns(results, numeric_cols)
             
             # Ensure y_col has numeric data
-            y_data = pd.to_numeric(results[y_col], errors='coerce').fillna(0)
+            y_data = self._numeric_values(results, y_col)
             
-            fig = px.line(x=results[x_col], y=y_data, title=f"Trend Analysis: {question}")
+            fig = _px.line(x=results[x_col], y=y_data, title=f"Trend Analysis: {question}")
             fig.update_layout(
                 xaxis_title=x_col,
                 yaxis_title=y_col,
@@ -148,17 +184,18 @@ class SmartVisualizer:
             )
             return fig
         except:
-            return self._create_simple_bar_chart(results, question)
+            return self._create_simple_bar_chart(results, question, numeric_cols)
     
-    def _create_bar_chart(self, results: pd.DataFrame, question: str) -> go.Figure:
+    def _create_bar_chart(self, results: pd.DataFrame, question: str,
+                          numeric_cols: List[str] = None) -> 'go.Figure':
         """Create a bar chart for categorical comparisons"""
         try:
-            x_col, y_col = self._find_xy_columns(results)
+            x_col, y_col = self._find_xy_columns(results, numeric_cols)
             
             # Ensure y_col has numeric data
-            y_data = pd.to_numeric(results[y_col], errors='coerce').fillna(0)
+            y_data = self._numeric_values(results, y_col)
             
-            fig = px.bar(x=results[x_col].astype(str), y=y_data, title=f"Comparison: {question}")
+            fig = _px.bar(x=results[x_col].astype(str), y=y_data, title=f"Comparison: {question}")
             fig.update_layout(
                 xaxis_title=x_col,
                 yaxis_title=y_col,
@@ -166,120 +203,78 @@ class SmartVisualizer:
             )
             return fig
         except:
-            return self._create_simple_bar_chart(results, question)
+            return self._create_simple_bar_chart(results, question, numeric_cols)
     
-    def _create_pie_chart(self, results: pd.DataFrame, question: str) -> go.Figure:
+    def _create_pie_chart(self, results: pd.DataFrame, question: str,
+                          numeric_cols: List[str] = None) -> 'go.Figure':
         """Create a pie chart for proportions"""
         try:
-            x_col, y_col = self._find_xy_columns(results)
+            x_col, y_col = self._find_xy_columns(results, numeric_cols)
             
             # Ensure y_col has numeric data
-            y_data = pd.to_numeric(results[y_col], errors='coerce').fillna(0)
+            y_data = self._numeric_values(results, y_col)
             
-            fig = px.pie(values=y_data, names=results[x_col].astype(str), title=f"Distribution: {question}")
+            fig = _px.pie(values=y_data, names=results[x_col].astype(str), title=f"Distribution: {question}")
             return fig
         except:
-            return self._create_simple_bar_chart(results, question)
+            return self._create_simple_bar_chart(results, question, numeric_cols)
     
-    def _create_scatter_chart(self, results: pd.DataFrame, question: str) -> go.Figure:
+    def _create_scatter_chart(self, results: pd.DataFrame, question: str,
+                              numeric_cols: List[str] = None) -> 'go.Figure':
         """Create a scatter plot for correlations"""
         try:
-            numeric_cols = []
-            for col in results.columns:
-                try:
-                    numeric_data = pd.to_numeric(results[col], errors='coerce')
-                    if not numeric_data.isna().all():
-                        numeric_cols.append(col)
-                except:
-                    continue
+            if numeric_cols is None:
+                numeric_cols = self._get_numeric_columns(results)
             
             if len(numeric_cols) >= 2:
-                x_data = pd.to_numeric(results[numeric_cols[0]], errors='coerce').fillna(0)
-                y_data = pd.to_numeric(results[numeric_cols[1]], errors='coerce').fillna(0)
+                x_data = self._numeric_values(results, numeric_cols[0])
+                y_data = self._numeric_values(results, numeric_cols[1])
                 
-                fig = px.scatter(x=x_data, y=y_data, title=f"Correlation: {question}")
+                fig = _px.scatter(x=x_data, y=y_data, title=f"Correlation: {question}")
                 fig.update_layout(
                     xaxis_title=numeric_cols[0],
                     yaxis_title=numeric_cols[1]
                 )
                 return fig
             else:
-                return self._create_simple_bar_chart(results, question)
+                return self._create_simple_bar_chart(results, question, numeric_cols)
         except:
-            return self._create_simple_bar_chart(results, question)
+            return self._create_simple_bar_chart(results, question, numeric_cols)
     
-    def _create_histogram(self, results: pd.DataFrame, question: str) -> go.Figure:
+    def _create_histogram(self, results: pd.DataFrame, question: str,
+                          numeric_cols: List[str] = None) -> 'go.Figure':
         """Create a histogram for distributions"""
         try:
-            numeric_cols = []
-            for col in results.columns:
-                try:
-                    numeric_data = pd.to_numeric(results[col], errors='coerce')
-                    if not numeric_data.isna().all():
-                        numeric_cols.append(col)
-                except:
-                    continue
+            if numeric_cols is None:
+                numeric_cols = self._get_numeric_columns(results)
             
             if len(numeric_cols) > 0:
-                x_data = pd.to_numeric(results[numeric_cols[0]], errors='coerce').fillna(0)
-                fig = px.histogram(x=x_data, title=f"Distribution: {question}")
+                x_data = self._numeric_values(results, numeric_cols[0])
+                fig = _px.histogram(x=x_data, title=f"Distribution: {question}")
                 fig.update_layout(xaxis_title=numeric_cols[0])
                 return fig
             else:
-                return self._create_simple_bar_chart(results, question)
+                return self._create_simple_bar_chart(results, question, numeric_cols)
         except:
-            return self._create_simple_bar_chart(results, question)
+            return self._create_simple_bar_chart(results, question, numeric_cols)
     
-    def _find_xy_columns(self, results: pd.DataFrame) -> Tuple[str, str]:
+    def _find_xy_columns(self, results: pd.DataFrame, numeric_cols: List[str] = None) -> Tuple[str, str]:
         """Find the best columns for x and y axes - more flexible approach"""
         columns = list(results.columns)
+        if numeric_cols is None:
+            numeric_cols = self._get_numeric_columns(results)
         
-        # Check for time/date columns
-        time_patterns = ['year', 'month', 'date', 'quarter', 'time', 'period']
-        x_col = None
-        for col in columns:
-            if any(pattern in col.lower() for pattern in time_patterns):
-                x_col = col
-                break
-        
-        # If no time column, use first categorical column
-        if not x_col:
-            for col in columns:
-                try:
-                    # Try to convert to numeric
-                    pd.to_numeric(results[col], errors='raise')
-                    # If successful, this is numeric, skip it for x-axis
-                except:
-                    # If conversion fails, this is categorical, use it for x-axis
-                    x_col = col
-                    break
-        
-        # If still no x_col, use first column
-        if not x_col:
-            x_col = columns[0]
-        
-        # Find numerical column for y-axis
-        y_col = None
-        for col in columns:
-            if col != x_col:  # Don't use the same column for both axes
-                try:
-                    numeric_data = pd.to_numeric(results[col], errors='coerce')
-                    if not numeric_data.isna().all():
-                        y_col = col
-                        break
-                except:
-                    continue
+        time_cols = [col for col in columns if _TIME_COL_RE.search(str(col))]
+        numeric_dtype_cols = set(results.select_dtypes(include='number').columns)
+        categorical_cols = [col for col in columns if col not in numeric_dtype_cols]
         
-        # If no numeric column found, use any other column
-        if not y_col:
-            for col in columns:
-                if col != x_col:
-                    y_col = col
-                    break
+        # x: a time/date column, else the first categorical column, else the first column
+        x_col = time_cols[0] if time_cols else (categorical_cols[0] if categorical_cols else columns[0])
         
-        # If still no y_col, use x_col (will create count chart)
-        if not y_col:
-            y_col = x_col
+        # y: a numeric column, else any other column, else x itself (will create count chart)
+        y_col = next((col for col in numeric_cols if col != x_col), None)
+        if y_col is None:
+            y_col = next((col for col in columns if col != x_col), x_col)
         
         return x_col, y_col
     
@@ -0,0 +1,103 @@
+import re
+from typing import Dict, Optional
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+
+_TRAILING_LIMIT_RE = re.compile(r'\bLIMIT\s+\d+(?:\s*(?:,|\bOFFSET\b)\s*\d+)?\s*;?\s*$', re.IGNORECASE)
+
+
+def _top_level(sql: str) -> str:
+    """The statement with string literals, quoted identifiers and parenthesized parts blanked out"""
+    parts, depth, quote = [], 0, None
+    for char in sql:
+        if quote:
+            if char == quote:
+                quote = None
+            parts.append(' ')
+        elif char in '\'"`':
+            quote = char
+            parts.append(' ')
+        elif char == '(':
+            depth += 1
+            parts.append(' ')
+        elif char == ')':
+            depth = max(depth - 1, 0)
+            parts.append(' ')
+        else:
+            parts.append(char if depth == 0 else ' ')
+    return ''.join(parts)
+
+
+def has_limit(sql: str) -> bool:
+    """True if the statement itself ends in LIMIT n, ignoring literals, quoted names and subqueries"""
+    return bool(_TRAILING_LIMIT_RE.search(_top_level(sql)))
+
+
+def backticks_to_double_quotes(sql: str) -> str:
+    """Rewrite `name` identifiers as "name" for standard-SQL engines, leaving string literals alone"""
+    parts, pos = [], 0
+    while pos < len(sql):
+        char = sql[pos]
+        if char in '\'"':
+            # Literal or already double-quoted name: copy it through; a doubled quote just reopens
+            end = sql.find(char, pos + 1)
+            end = len(sql) if end < 0 else end + 1
+        elif char == '`':
+            end = sql.find('`', pos + 1)
+            if end < 0:
+                parts.append(sql[pos:])
+                break
+            parts.append('"' + sql[pos + 1:end].replace('"', '""') + '"')
+            pos = end + 1
+            continue
+        else:
+            end = pos + 1
+        parts.append(sql[pos:end])
+        pos = end
+    return ''.join(parts)
+
+
+def build_automaton(names: Dict[str, str]):
+    """Aho-Corasick automaton over lowercase column names, or None without pyahocorasick"""
+    if ahocorasick is None or not names:
+        return None
+    automaton = ahocorasick.Automaton()
+    for lowered, col in names.items():
+        automaton.add_word(lowered, (len(lowered), col))
+    automaton.make_automaton()
+    return automaton
+
+
+def _is_boundary(char: str) -> bool:
+    return not (char == '`' or char == '_' or char.isalnum())
+
+
+def quote_with_automaton(sql: str, automaton) -> Optional[str]:
+    """Backtick every unquoted column in one scan; None if offsets can't be trusted"""
+    lowered = sql.lower()
+    # Offsets only line up when lowercasing kept the length (true for ASCII)
+    if len(lowered) != len(sql):
+        return None
+
+    # Keep leftmost-longest, non-overlapping matches that sit on identifier boundaries
+    matches = sorted(
+        ((end - length + 1, end + 1, col) for end, (length, col) in automaton.iter(lowered)),
+        key=lambda m: (m[0], -m[1])
+    )
+    parts, pos = [], 0
+    for start, end, col in matches:
+        if start < pos:
+            continue
+        if start > 0 and not _is_boundary(sql[start - 1]):
+            continue
+        if end < len(sql) and not _is_boundary(sql[end]):
+            continue
+        parts.append(sql[pos:start])
+        parts.append(f'`{col}`')
+        pos = end
+    parts.append(sql[pos:])
+    return ''.join(parts)
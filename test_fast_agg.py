@@ -0,0 +1,56 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from fast_agg import min_max, quick_insight
+
+
+class QuickInsightTest(unittest.TestCase):
+    def test_count_query(self):
+        results = pd.DataFrame({'COUNT(*)': [1234]})
+        self.assertEqual(quick_insight('How many orders are there?', results, 'SELECT COUNT(*) FROM orders'),
+                         "The count is 1,234.")
+
+    def test_aliased_count_query(self):
+        results = pd.DataFrame({'n': [7]})
+        self.assertEqual(quick_insight('count the rows', results, 'select count(*) as n from orders'),
+                         "The count is 7.")
+
+    def test_sum_is_not_reported_as_count(self):
+        results = pd.DataFrame({'SUM(revenue)': [12345.0]})
+        self.assertIsNone(quick_insight('total number of sales revenue', results,
+                                        'SELECT SUM(revenue) FROM sales'))
+
+    def test_average_is_not_reported_as_count(self):
+        results = pd.DataFrame({'AVG(items)': [3.5]})
+        self.assertIsNone(quick_insight('average number of items per order', results,
+                                        'SELECT AVG(items) FROM orders'))
+
+    def test_top_n(self):
+        results = pd.DataFrame({'product': ['a', 'b', 'c'], 'revenue': [10.0, 30.0, 20.0]})
+        self.assertEqual(quick_insight('top 2 products by revenue', results),
+                         "Top 2 by revenue: b (30), c (20).")
+
+    def test_bottom_n(self):
+        results = pd.DataFrame({'product': ['a', 'b', 'c'], 'revenue': [10.0, 30.0, 20.0]})
+        self.assertEqual(quick_insight('lowest 1 product', results), "Bottom 1 by revenue: a (10).")
+
+    def test_total_by_group(self):
+        results = pd.DataFrame({'region': ['n', 's', 'n'], 'sales': [1.0, 2.5, 3.0]})
+        self.assertEqual(quick_insight('total sales by region', results), "sales by region - n: 4; s: 2.50.")
+
+    def test_defers_to_llm(self):
+        self.assertIsNone(quick_insight('how many rows', pd.DataFrame()))
+        results = pd.DataFrame({'region': ['n'], 'sales': [np.nan]})
+        self.assertIsNone(quick_insight('top regions', results))
+        self.assertIsNone(quick_insight('describe the data', pd.DataFrame({'a': ['x'], 'b': [1]})))
+
+
+class MinMaxTest(unittest.TestCase):
+    def test_ignores_nan(self):
+        self.assertEqual(min_max(np.array([np.nan, 3.0, -1.0, np.nan, 8.0])), (-1.0, 8.0))
+
+
+if __name__ == "__main__":
+    unittest.main()
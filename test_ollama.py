@@ -1,8 +1,12 @@
-import requests
+from ollama_client import create_session
+
+OLLAMA_URL = "http://localhost:11434"
+# One keep-alive session for every check made from this process
+session = create_session(OLLAMA_URL)
 
 def test_ollama():
     try:
-        response = requests.post("http://localhost:11434/api/generate", json={
+        response = session.post(f"{OLLAMA_URL}/api/generate", json={
             "model": "llama3",
             "prompt": "Convert this to SQL: Show all products",
             "stream": False
@@ -0,0 +1,71 @@
+import unittest
+
+from sql_quoting import ahocorasick, backticks_to_double_quotes, build_automaton, has_limit, quote_with_automaton
+
+
+@unittest.skipIf(ahocorasick is None, "pyahocorasick not installed")
+class QuoteWithAutomatonTest(unittest.TestCase):
+    def setUp(self):
+        self.automaton = build_automaton({'job title': 'Job Title', 'salary': 'Salary', 'age': 'Age'})
+
+    def test_quotes_columns(self):
+        self.assertEqual(quote_with_automaton("SELECT job title, salary FROM t", self.automaton),
+                         "SELECT `Job Title`, `Salary` FROM t")
+
+    def test_skips_partial_words(self):
+        self.assertEqual(quote_with_automaton("SELECT wage, salary_band FROM t", self.automaton),
+                         "SELECT wage, salary_band FROM t")
+
+    def test_leaves_already_quoted_columns(self):
+        self.assertEqual(quote_with_automaton("SELECT `Salary` FROM t", self.automaton),
+                         "SELECT `Salary` FROM t")
+
+    def test_prefers_longest_match(self):
+        automaton = build_automaton({'job': 'Job', 'job title': 'Job Title'})
+        self.assertEqual(quote_with_automaton("SELECT job title FROM t", automaton),
+                         "SELECT `Job Title` FROM t")
+
+    def test_non_ascii_offsets_fall_back(self):
+        self.assertIsNone(quote_with_automaton("SELECT salary FROM t WHERE name = 'İ'", self.automaton))
+
+
+class BuildAutomatonTest(unittest.TestCase):
+    def test_no_names(self):
+        self.assertIsNone(build_automaton({}))
+
+
+class HasLimitTest(unittest.TestCase):
+    def test_trailing_limit(self):
+        self.assertTrue(has_limit("SELECT * FROM t LIMIT 5"))
+        self.assertTrue(has_limit("select * from t order by a limit 10 offset 20;"))
+        self.assertTrue(has_limit("SELECT * FROM t LIMIT 20, 10"))
+
+    def test_no_limit(self):
+        self.assertFalse(has_limit("SELECT * FROM t"))
+
+    def test_limit_in_string_literal(self):
+        self.assertFalse(has_limit("SELECT * FROM t WHERE note = 'no limit 5'"))
+
+    def test_limit_in_quoted_identifier(self):
+        self.assertFalse(has_limit("SELECT `Credit Limit` FROM t"))
+        self.assertFalse(has_limit('SELECT * FROM t ORDER BY "limit 3"'))
+
+    def test_limit_only_in_subquery(self):
+        self.assertFalse(has_limit("SELECT * FROM t WHERE id IN (SELECT id FROM u LIMIT 5)"))
+        self.assertTrue(has_limit("SELECT * FROM (SELECT * FROM u LIMIT 5) s LIMIT 2"))
+
+
+class BackticksToDoubleQuotesTest(unittest.TestCase):
+    def test_rewrites_identifiers(self):
+        self.assertEqual(backticks_to_double_quotes("SELECT `Job Title` FROM `sal`"), 'SELECT "Job Title" FROM "sal"')
+
+    def test_leaves_string_literals(self):
+        self.assertEqual(backticks_to_double_quotes("SELECT `a` FROM t WHERE b = 'x`y' OR c = 'it''s `q`'"),
+                         """SELECT "a" FROM t WHERE b = 'x`y' OR c = 'it''s `q`'""")
+
+    def test_escapes_double_quotes_in_names(self):
+        self.assertEqual(backticks_to_double_quotes('SELECT `say "hi"` FROM t'), 'SELECT "say ""hi""" FROM t')
+
+
+if __name__ == "__main__":
+    unittest.main()
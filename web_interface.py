@@ -2,12 +2,20 @@ import streamlit as st
 import pandas as pd
 from data_analyst_mysql import DataAnalystAssistant
 from enhanced_visualizer import EnhancedVisualizer
+import hashlib
 import os
+import shutil
+from collections import deque
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
 
 st.set_page_config(page_title="Data Analyst Assistant", layout="wide")
 
-# Custom CSS for better UI
-st.markdown("""
+# All app styling in one static block; st.html injects it without the markdown pipeline
+APP_CSS = """
 <style>
     .main-header {
         background: linear-gradient(90deg, #2E86AB 0%, #A23B72 100%);
@@ -53,12 +61,7 @@ st.markdown("""
         border-radius: 8px;
         padding: 1rem;
     }
-</style>
-""", unsafe_allow_html=True)
 
-# Add custom CSS for styling the expander
-st.markdown("""
-<style>
 /* Style the expander title */
 div[data-testid="stExpander"] > details > summary {
     background: linear-gradient(90deg, #12c2e9, #c471ed, #f64f59);
@@ -90,24 +93,179 @@ div[data-testid="stExpander"] > div {
     margin-top: 0.5rem;
     box-shadow: 0 2px 6px rgba(0,0,0,0.1);
 }
+
+/* Centered Ollama URL input in the sidebar */
+.centered-text-input {
+    display: flex;
+    justify-content: center;
+    margin-bottom: 20px;
+}
+.centered-text-input input {
+    text-align: center; /* Centers text inside input */
+    width: 50%; /* Adjust width */
+}
+
+/* Dashed separator under the sidebar buttons */
+.dashed-line {
+    border: none;
+    border-top: 2px dashed #c471ed; /* Purple dashed line */
+    margin: 15px auto;
+    width: 100%; /* Centered with reduced width */
+}
 </style>
-""", unsafe_allow_html=True)
+"""
+st.html(APP_CSS)
+
+# Oldest chat turns (and their DataFrames and charts) are dropped beyond this many
+MAX_CHAT_TURNS = 50
+# Successful answers kept for replaying a repeated question about the same table
+ANSWER_CACHE_SIZE = 50
+# Larger results show only this many rows in the grid, with the rest offered as a CSV download
+RESULT_DISPLAY_ROWS = 1_000
 
 # Initialize session state
 if 'assistant' not in st.session_state:
     st.session_state.assistant = None
 if 'chat_history' not in st.session_state:
-    st.session_state.chat_history = []
+    st.session_state.chat_history = deque(maxlen=MAX_CHAT_TURNS)
+    # Stable per-turn widget keys, since positions shift once old turns fall off
+    st.session_state.turns_asked = 0
 if 'visualizer' not in st.session_state:
     st.session_state.visualizer = EnhancedVisualizer()
 if 'current_table' not in st.session_state:
     st.session_state.current_table = None
+if 'loaded_uploads' not in st.session_state:
+    # table name -> (upload file_id, load message) of the upload last loaded into it
+    st.session_state.loaded_uploads = {}
+if 'answers' not in st.session_state:
+    # blake2b(table, question) -> the chat turn that answered it
+    st.session_state.answers = {}
+
+
+def results_frame(results):
+    """DataFrame from analyze's column lists, Arrow-backed when pyarrow can hold every column"""
+    if pa is not None:
+        try:
+            # Compact string columns, and st.dataframe sends them on without converting
+            return pa.Table.from_pydict(results).to_pandas(types_mapper=pd.ArrowDtype)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            pass
+    return pd.DataFrame(results)
+
+
+def chat_artifacts(chat):
+    """Build a chat turn's DataFrame, chart and texts on first display; later reruns reuse them"""
+    if '_df' not in chat:
+        visualizer = st.session_state.visualizer
+        # analyze returns columns as lists, which pandas takes without per-row dict handling;
+        # the lists are dropped once the DataFrame holds the same data
+        results_df = results_frame(chat.pop('results'))
+        # Pick chart type and axes once; chart, code and explanation all reuse it
+        chart_plan = visualizer.plan_chart(chat['question'], chat['sql_query'], results_df)
+        chat['_df'] = results_df
+        chat['_chart_plan'] = chart_plan
+        chat['_summary'] = visualizer.get_chart_summary(results_df)
+        chat['_chart'] = visualizer.create_visualization(chat['question'], chat['sql_query'], results_df, chart_plan)
+        chat['_viz_explanation'] = visualizer.get_visualization_explanation(
+            chat['question'], chat['sql_query'], results_df, chart_plan
+        )
+    return chat
+
+def plotly_code(chat):
+    """Generate a turn's Plotly code the first time it is asked for"""
+    if '_plotly_code' not in chat:
+        chat['_plotly_code'] = st.session_state.visualizer.generate_plotly_code(
+            chat['question'], chat['sql_query'], chat['_df'], chat['_chart_plan']
+        )
+    return chat['_plotly_code']
+
+
+def results_csv(chat):
+    """A turn's full results as CSV bytes, encoded once for its download button"""
+    if '_csv' not in chat:
+        chat['_csv'] = chat['_df'].to_csv(index=False).encode()
+    return chat['_csv']
+
+
+def render_assistant_turn(turn, insight_chunks=None, latest=True):
+    """Render one assistant reply; a new turn streams its insights from insight_chunks"""
+    if not turn['success']:
+        st.error(turn['error'])
+        return
+    
+    if insight_chunks is not None:
+        turn['insights'] = st.write_stream(insight_chunks).strip()
+    else:
+        st.write(turn['insights'])
+    
+    # Add visualization if possible
+    if '_df' in turn or turn.get('results'):
+        chat_artifacts(turn)
+        results_df = turn['_df']
+        
+        # Show table results right after insights
+        if len(results_df) > RESULT_DISPLAY_ROWS:
+            # Fixed-height grid over the first rows only, so the browser isn't sent the whole result
+            st.dataframe(results_df.head(RESULT_DISPLAY_ROWS), height=400, use_container_width=True)
+            st.caption(f"Showing the first {RESULT_DISPLAY_ROWS:,} of {len(results_df):,} rows.")
+            st.download_button("Download full CSV", results_csv(turn), file_name="results.csv",
+                               mime="text/csv", key=f"csv_{turn['_turn']}")
+        else:
+            st.dataframe(results_df)
+        
+        # Clean data summary
+        st.info(turn['_summary'])
+        
+        # Display chart
+        chart = turn['_chart']
+        if chart:
+            st.markdown('<div class="chart-container">', unsafe_allow_html=True)
+            # Only the latest chart stays interactive; older ones render as static snapshots
+            config = None if latest else {'staticPlot': True, 'displayModeBar': False}
+            st.plotly_chart(chart, use_container_width=True, key=f"chart_{turn['_turn']}", config=config)
+            st.markdown('</div>', unsafe_allow_html=True)
+        
+        # Optional: Show advanced details in collapsible section
+        with st.expander("🔧 Advanced Details"):
+            col1, col2 = st.columns(2)
+            with col1:
+                st.write(f"**Shape:** {results_df.shape}")
+                st.write(f"**Columns:** {list(results_df.columns)}")
+            with col2:
+                st.write(f"**Data Types:** {dict(results_df.dtypes)}")
+                st.write("**Sample Data:**")
+                st.dataframe(results_df.head(3))
+            
+            # Generated Plotly code, only built once someone asks to see it
+            if st.checkbox("Show generated Plotly code", key=f"plotly_code_{turn['_turn']}"):
+                st.code(plotly_code(turn), language='python')
+        
+        st.success(turn['_viz_explanation'])
+    
+    with st.expander("View SQL Query"):
+        st.code(turn['sql_query'], language='sql')
 
 st.markdown('<div class="main-header"><h1>🤖 LLM-Based Data Analyst Assistant</h1></div>', unsafe_allow_html=True)
 
-# Sidebar for configuration
-# Sidebar for configuration
-with st.sidebar:
+def show_notice(place):
+    """Show the message a sidebar action left for its spot before it reran the whole app"""
+    notice = st.session_state.get('sidebar_notice')
+    if notice and notice[0] == place:
+        del st.session_state.sidebar_notice
+        getattr(st, notice[1])(notice[2])
+
+
+def rerun_app(place, kind, message):
+    """Rerun the full script once the sidebar changed what the main area shows"""
+    # New assistant or newly loaded data: earlier answers may no longer hold
+    st.session_state.answers.clear()
+    st.session_state.sidebar_notice = (place, kind, message)
+    st.rerun(scope="app")
+
+
+# Sidebar for configuration; a fragment, so typing in its inputs doesn't replay the chat
+@st.fragment
+def sidebar_panel():
     # Stylized DRAKO title
     st.markdown("""
     <div style="
@@ -142,21 +300,6 @@ Configuration
 """, unsafe_allow_html=True)
 
 
-    # Add custom CSS
-    st.markdown("""
-    <style>
-    .centered-text-input {
-        display: flex;
-        justify-content: center;
-        margin-bottom: 20px;
-    }
-    .centered-text-input input {
-        text-align: center; /* Centers text inside input */
-        width: 50%; /* Adjust width */
-    }
-    </style>
-    """, unsafe_allow_html=True)
-
 # Wrap your input inside a container with the custom class
     st.markdown('<div class="centered-text-input">', unsafe_allow_html=True)
     ollama_url = st.text_input("Ollama URL", value="http://localhost:11434")
@@ -182,29 +325,27 @@ Configuration
                         'password': mysql_password,
                         'database': mysql_database
                     }
-                    st.session_state.assistant = DataAnalystAssistant(ollama_url, mysql_config)
-                    st.success("Connected to MySQL and initialized assistant!")
+                    connection_key = (ollama_url, tuple(sorted(mysql_config.items())))
+                    if st.session_state.assistant and st.session_state.get('mysql_connection') == connection_key:
+                        # Same settings: keep the live assistant rather than reconnect and re-read the schema
+                        st.success("Already connected to this MySQL database.")
+                    else:
+                        st.session_state.assistant = DataAnalystAssistant(ollama_url, mysql_config)
+                        st.session_state.mysql_connection = connection_key
+                        rerun_app('mysql', 'success', "Connected to MySQL and initialized assistant!")
                 except Exception as e:
                     st.error(f"Failed to connect: {str(e)}")
+        show_notice('mysql')
 
                     
 
     # Button for file-only mode
     if st.button("Work with Files Only") and not st.session_state.assistant:
         st.session_state.assistant = DataAnalystAssistant(ollama_url)
-        st.success("Assistant initialized for file-only mode!")
+        rerun_app('files', 'success', "Assistant initialized for file-only mode!")
+    show_notice('files')
     # Add a beautiful dashed horizontal line below the button
-    st.markdown("""
-<hr class="dashed-line">
-<style>
-.dashed-line {
-    border: none;
-    border-top: 2px dashed #c471ed; /* Purple dashed line */
-    margin: 15px auto;
-    width: 100%; /* Centered with reduced width */
-}
-</style>
-""", unsafe_allow_html=True)
+    st.markdown('<hr class="dashed-line">', unsafe_allow_html=True)
     
     
     st.markdown("""
@@ -225,66 +366,48 @@ Upload Data
     if uploaded_files:
         if not st.session_state.assistant:
             st.session_state.assistant = DataAnalystAssistant(ollama_url)
-            st.info("Assistant auto-initialized for file uploads")
+            rerun_app('upload', 'info', "Assistant auto-initialized for file uploads")
+        show_notice('upload')
         
         for file in uploaded_files:
-            # Save uploaded file temporarily
-            temp_path = f"temp_{file.name}"
-            with open(temp_path, "wb") as f:
-                f.write(file.getbuffer())
-            
             # Load into assistant
             table_name = st.text_input(f"Table name for {file.name}", 
                                      value=os.path.splitext(file.name)[0])
             
             if st.button(f"Load {file.name}"):
-                try:
-                    result = st.session_state.assistant.load_file(temp_path, table_name)
-                    st.success(result)
-                    os.remove(temp_path)  # Clean up
-                except Exception as e:
-                    st.error(f"Error loading file: {str(e)}")
-
-# Main interface
-if st.session_state.assistant:
-    # Show available tables
-    if st.session_state.assistant.tables:
-        st.subheader("Available Tables")
-        
-        # Dropdown to select table
-        table_names = st.session_state.assistant.get_available_tables()
-        if table_names:
-            selected_table = st.selectbox("Select a table to view:", ["-- Select Table --"] + table_names)
-            
-            # Clear chat history when table changes
-            if selected_table != st.session_state.current_table and selected_table != "-- Select Table --":
-                st.session_state.chat_history = []
-                st.session_state.current_table = selected_table
-                st.rerun()
-            
-            if selected_table != "-- Select Table --":
-                info = st.session_state.assistant.tables[selected_table]
-                st.write(f"**Table:** {selected_table}")
-                st.write(f"**Columns:** {', '.join(info['columns'])}")
-                st.write("**Sample data:**")
-                if info['sample_data']:
-                    st.dataframe(pd.DataFrame(info['sample_data']))
+                loaded = st.session_state.loaded_uploads.get(table_name)
+                if loaded and loaded[0] == file.file_id and table_name in st.session_state.assistant.tables:
+                    # Same upload into the same table again: nothing to re-read or re-insert
+                    st.success(loaded[1])
                 else:
-                    st.write("No sample data available")
-                
-                # Show context indicator
-                st.info(f"💬 Chat context: {selected_table} table")
-        
-        # Expandable view for all tables
-        with st.expander("View All Tables Details"):
-            for table_name, info in st.session_state.assistant.tables.items():
-                st.write(f"**{table_name}**")
-                st.write(f"Columns: {', '.join(info['columns'])}")
-                if info['sample_data']:
-                    st.dataframe(pd.DataFrame(info['sample_data'][:2]))
-                st.write("---")
-    
-    # Chat interface
+                    temp_path = None
+                    try:
+                        file.seek(0)
+                        if file.name.endswith('.csv'):
+                            # CSVs are read straight from the upload, no copy on disk
+                            result = st.session_state.assistant.load_file(file, table_name)
+                        else:
+                            # Excel readers want a path; copy 1 MiB at a time instead of one big buffer
+                            temp_path = f"temp_{file.name}"
+                            with open(temp_path, "wb") as f:
+                                shutil.copyfileobj(file, f, length=1 << 20)
+                            result = st.session_state.assistant.load_file(temp_path, table_name)
+                        st.session_state.loaded_uploads[table_name] = (file.file_id, result)
+                        rerun_app(f"load_{file.name}", 'success', result)
+                    except Exception as e:
+                        st.error(f"Error loading file: {str(e)}")
+                    finally:
+                        if temp_path and os.path.exists(temp_path):
+                            os.remove(temp_path)  # Clean up
+            show_notice(f"load_{file.name}")
+
+with st.sidebar:
+    sidebar_panel()
+
+
+# Chat area as a fragment: asking a question reruns only this part, not the sidebar and table views
+@st.fragment
+def chat_area():
     st.subheader("Ask Questions About Your Data")
     
     # DML Operations help
@@ -309,56 +432,7 @@ if st.session_state.assistant:
             st.write(chat['question'])
         
         with st.chat_message("assistant"):
-            if chat['success']:
-                st.write(chat['insights'])
-                
-                # Add visualization if possible
-                if 'results' in chat and chat['results']:
-                    results_df = pd.DataFrame(chat['results'])
-                    
-                    # Show table results right after insights
-                    st.dataframe(results_df)
-                    
-                    # Clean data summary
-                    data_summary = st.session_state.visualizer.get_chart_summary(results_df)
-                    st.info(data_summary)
-                    
-                    # Create and display chart
-                    chart = st.session_state.visualizer.create_visualization(
-                        chat['question'], chat['sql_query'], results_df
-                    )
-                    if chart:
-                        st.markdown('<div class="chart-container">', unsafe_allow_html=True)
-                        st.plotly_chart(chart, use_container_width=True)
-                        st.markdown('</div>', unsafe_allow_html=True)
-                    
-                    # Optional: Show advanced details in collapsible section
-                    with st.expander("🔧 Advanced Details"):
-                        col1, col2 = st.columns(2)
-                        with col1:
-                            st.write(f"**Shape:** {results_df.shape}")
-                            st.write(f"**Columns:** {list(results_df.columns)}")
-                        with col2:
-                            st.write(f"**Data Types:** {dict(results_df.dtypes)}")
-                            st.write("**Sample Data:**")
-                            st.dataframe(results_df.head(3))
-                        
-                        # Generated Plotly code
-                        st.write("**Generated Plotly Code:**")
-                        plotly_code = st.session_state.visualizer.generate_plotly_code(
-                            chat['question'], chat['sql_query'], results_df
-                        )
-                        st.code(plotly_code, language='python')
-                    
-                    viz_explanation = st.session_state.visualizer.get_visualization_explanation(
-                        chat['question'], chat['sql_query'], results_df
-                    )
-                    st.success(viz_explanation)
-                
-                with st.expander("View SQL Query"):
-                    st.code(chat['sql_query'], language='sql')
-            else:
-                st.error(chat['error'])
+            render_assistant_turn(chat, latest=chat is st.session_state.chat_history[-1])
     
     # Input for new question
     question = st.chat_input("Ask a question about your data...")
@@ -368,61 +442,81 @@ if st.session_state.assistant:
             st.write(question)
         
         with st.chat_message("assistant"):
-            with st.spinner("Analyzing..."):
-                result = st.session_state.assistant.analyze(question, st.session_state.current_table)
-                st.session_state.chat_history.append(result)
-                
-                if result['success']:
-                    st.write(result['insights'])
-                    
-                    # Add visualization if possible
-                    if 'results' in result and result['results']:
-                        results_df = pd.DataFrame(result['results'])
-                        
-                        # Show table results right after insights
-                        st.dataframe(results_df)
-                        
-                        # Clean data summary
-                        data_summary = st.session_state.visualizer.get_chart_summary(results_df)
-                       
-                        st.info(data_summary)
-                        
-                        # Create and display chart
-                        chart = st.session_state.visualizer.create_visualization(
-                            question, result['sql_query'], results_df
-                        )
-                        if chart:
-                           # # st.markdown('<div class="chart-container">', unsafe_allow_html=True)
-                            st.plotly_chart(chart, use_container_width=True)
-                            st.markdown('</div>', unsafe_allow_html=True)
-                        
-                        # Optional: Show advanced details in collapsible section
-                        with st.expander("🔧 Advanced Details"):
-                            col1, col2 = st.columns(2)
-                            with col1:
-                                st.write(f"**Shape:** {results_df.shape}")
-                                st.write(f"**Columns:** {list(results_df.columns)}")
-                            with col2:
-                                st.write(f"**Data Types:** {dict(results_df.dtypes)}")
-                                st.write("**Sample Data:**")
-                                st.dataframe(results_df.head(3))
-                            
-                            # Generated Plotly code
-                            st.write("**Generated Plotly Code:**")
-                            plotly_code = st.session_state.visualizer.generate_plotly_code(
-                                question, result['sql_query'], results_df
-                            )
-                            st.code(plotly_code, language='python')
-                        
-                        viz_explanation = st.session_state.visualizer.get_visualization_explanation(
-                            question, result['sql_query'], results_df
-                        )
-                        st.success(viz_explanation)
-                    
-                    with st.expander("View SQL Query"):
-                        st.code(result['sql_query'], language='sql')
+            answers = st.session_state.answers
+            answer_key = hashlib.blake2b(
+                f"{st.session_state.current_table}\x00{question.strip()}".encode(), digest_size=16
+            ).digest()
+            answered = answers.get(answer_key)
+            if answered is not None:
+                # Asked before about this table: replay that turn, DataFrame and chart included
+                result, insight_chunks = dict(answered), None
+            else:
+                with st.spinner("Analyzing..."):
+                    # SQL runs here; the insight text streams in below as the model writes it
+                    result, insight_chunks = st.session_state.assistant.analyze_stream(question, st.session_state.current_table)
+            result['_turn'] = st.session_state.turns_asked
+            st.session_state.turns_asked += 1
+            st.session_state.chat_history.append(result)
+            modified = result['success'] and not result['sql_query'].lstrip().upper().startswith(('SELECT', 'WITH'))
+            if modified:
+                # The table was modified, so loading its upload again is no longer a no-op
+                st.session_state.loaded_uploads.pop(st.session_state.current_table, None)
+                answers.clear()
+            render_assistant_turn(result, insight_chunks)
+            if modified:
+                # Table previews outside this fragment are stale now; history replays the turn
+                st.rerun()
+            if result['success'] and answered is None:
+                answers[answer_key] = result
+                if len(answers) > ANSWER_CACHE_SIZE:
+                    del answers[next(iter(answers))]
+
+
+# Main interface
+if st.session_state.assistant:
+    # Show available tables
+    if st.session_state.assistant.tables:
+        st.subheader("Available Tables")
+        
+        # Dropdown to select table
+        table_names = st.session_state.assistant.get_available_tables()
+        if table_names:
+            selected_table = st.selectbox("Select a table to view:", ["-- Select Table --"] + table_names)
+            
+            # Clear chat history when table changes; the chat area renders further down this same run
+            if selected_table != st.session_state.current_table and selected_table != "-- Select Table --":
+                st.session_state.chat_history.clear()
+                st.session_state.current_table = selected_table
+            
+            if selected_table != "-- Select Table --":
+                info = st.session_state.assistant.tables[selected_table]
+                st.write(f"**Table:** {selected_table}")
+                st.write(f"**Columns:** {info['columns_str']}")
+                st.write("**Sample data:**")
+                sample_df = st.session_state.assistant.get_sample_frame(selected_table)
+                if not sample_df.empty:
+                    st.dataframe(sample_df)
                 else:
-                    st.error(result['error'])
+                    st.write("No sample data available")
+                
+                # Show context indicator
+                st.info(f"💬 Chat context: {selected_table} table")
+        
+        # Expandable view for all tables
+        with st.expander("View All Tables Details"):
+            # The expander body runs on every rerun even when collapsed, so build previews only on request
+            if st.checkbox("Show table details", key='_show_all_tables'):
+                for table_name, info in st.session_state.assistant.tables.items():
+                    st.write(f"**{table_name}**")
+                    st.write(f"Columns: {info['columns_str']}")
+                    sample_data = st.session_state.assistant.get_sample_data(table_name)
+                    if sample_data:
+                        # Static table straight from the row dicts: no DataFrame or grid for two rows
+                        st.table(sample_data[:2])
+                    st.write("---")
+    
+    # Chat interface
+    chat_area()
 
 else:
     st.warning("Please connect to MySQL database in the sidebar. Make sure Ollama is running with Llama 3 model.")